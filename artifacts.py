@@ -0,0 +1,273 @@
+"""Background PDF rendering and artifact storage.
+
+``ArtifactStore.submit`` returns a unique artifact id immediately and
+renders the PDF on a small thread pool, so rendering never adds to API
+latency and concurrent requests for similar titles cannot overwrite each
+other. Rendered PDFs are written to ``<root>/<id>.pdf`` and the most recent
+ones are also kept in memory for serving downloads. While a PDF renders an
+``<id>.pending`` marker exists, replaced by ``<id>.failed`` (holding the
+error) if rendering fails, so ``get`` in any other process sharing the
+directory can tell a pending or failed artifact from an unknown one. PDFs older than
+``max_age`` seconds, and the oldest beyond ``max_files``, are deleted by a
+sweep that runs at most once every ``SWEEP_INTERVAL`` seconds after a render.
+"""
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+_ARTIFACT_ID = re.compile(r"^[0-9a-f]{32}$")
+SWEEP_INTERVAL = 60
+# A pending marker this old belongs to a render that died with its process
+PENDING_TIMEOUT = 600
+
+
+class Artifact:
+    def __init__(self, artifact_id, path, name="output"):
+        self.id = artifact_id
+        self.path = path
+        self.name = name
+        self.status = "pending"
+        self.etag = None
+        self.size = None
+        self.error = None
+        self.created = time.time()
+        self._ready = threading.Event()
+        self._store = None  # set when another process renders it
+
+    def wait(self, timeout=None):
+        if self._store is None or self._ready.is_set():
+            return self._ready.wait(timeout)
+        # Rendering elsewhere: watch the shared directory
+        end = None if timeout is None else time.monotonic() + timeout
+        while not self._store._refresh(self):
+            remaining = None if end is None else end - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            time.sleep(0.1 if remaining is None else min(0.1, remaining))
+        return True
+
+
+class ArtifactStore:
+    def __init__(self, root, render, workers=2, memory_bytes=64 * 1024 * 1024, max_tracked=10000,
+                 max_age=7 * 24 * 3600, max_files=5000):
+        # render(content) -> PDF bytes; max_age / max_files <= 0 disable that limit
+        self.root = root
+        self.render = render
+        self.workers = workers
+        self.memory_bytes = memory_bytes
+        self.max_tracked = max_tracked
+        self.max_age = max_age
+        self.max_files = max_files
+        self._last_sweep = 0.0
+
+        self._artifacts = OrderedDict()
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, content):
+        """Queue ``content`` for rendering and return the new artifact id."""
+        artifact_id = uuid.uuid4().hex
+        name = content.get('title', content.get('topic', 'output'))
+        artifact = Artifact(artifact_id, os.path.join(self.root, f"{artifact_id}.pdf"), _slug(name))
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(f"{artifact.path[:-4]}.pending", "w", encoding="utf-8") as f:
+                f.write(artifact.name)
+        except OSError as e:
+            print(f"⚠️ Could not mark PDF {artifact_id} as pending: {str(e)}")
+
+        with self._lock:
+            self._artifacts[artifact_id] = artifact
+            while len(self._artifacts) > self.max_tracked:
+                self._artifacts.popitem(last=False)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="pdf-render")
+
+        self._executor.submit(self._render, artifact, dict(content))
+        return artifact_id
+
+    def get(self, artifact_id):
+        """Return the artifact, falling back to the files of artifacts submitted by other processes."""
+        if not _ARTIFACT_ID.match(artifact_id):
+            return None
+
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+        if artifact is not None:
+            return artifact
+
+        path = os.path.join(self.root, f"{artifact_id}.pdf")
+        if not any(os.path.exists(path[:-4] + ext) for ext in (".pdf", ".pending", ".failed")):
+            return None
+        artifact = Artifact(artifact_id, path)
+        artifact._store = self
+        self._refresh(artifact)
+        return artifact
+
+    def _refresh(self, artifact):
+        """Update an artifact submitted by another process from its files; True once it is settled."""
+        base = artifact.path[:-4]
+        try:
+            stat = os.stat(artifact.path)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is not None:
+            artifact.size = stat.st_size
+            artifact.etag = _etag(stat)
+            artifact.status = "ready"
+        else:
+            error = _read(f"{base}.failed")
+            if error is not None:
+                artifact.status = "failed"
+                artifact.error = error
+            else:
+                name = _read(f"{base}.pending")
+                if name is not None and _age(f"{base}.pending") < PENDING_TIMEOUT:
+                    artifact.name = name or artifact.name
+                    artifact.status = "pending"
+                    return False
+                if os.path.exists(artifact.path):
+                    # Rendered between the checks: the PDF is written before the marker goes
+                    return self._refresh(artifact)
+                artifact.status = "failed"
+                artifact.error = "PDF is no longer available"
+        artifact._ready.set()
+        return True
+
+    def wait(self, artifact_id, timeout=None):
+        artifact = self.get(artifact_id)
+        if artifact is not None:
+            artifact.wait(timeout)
+        return artifact
+
+    def read(self, artifact):
+        """Return the PDF bytes if they are still held in memory, else None."""
+        with self._lock:
+            data = self._memory.get(artifact.id)
+            if data is not None:
+                self._memory.move_to_end(artifact.id)
+            return data
+
+    def _render(self, artifact, content):
+        try:
+            with metrics.span("render_pdf"):
+                data = self.render(content)
+
+            os.makedirs(self.root, exist_ok=True)
+            tmp = f"{artifact.path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, artifact.path)
+            _remove(f"{artifact.path[:-4]}.pending")
+
+            stat = os.stat(artifact.path)
+            artifact.size = len(data)
+            artifact.etag = _etag(stat)
+            self._remember(artifact.id, data)
+            artifact.status = "ready"
+            print(f"\n📄 PDF saved at: {artifact.path}")
+        except Exception as e:
+            artifact.status = "failed"
+            artifact.error = str(e)
+            print(f"⚠️ PDF rendering failed: {str(e)}")
+            try:
+                with open(f"{artifact.path[:-4]}.failed", "w", encoding="utf-8") as f:
+                    f.write(artifact.error)
+            except OSError:
+                pass
+            _remove(f"{artifact.path[:-4]}.pending")
+        finally:
+            artifact._ready.set()
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+        try:
+            self.sweep(now)
+        except OSError as e:
+            print(f"⚠️ PDF cleanup failed: {str(e)}")
+
+    def sweep(self, now=None):
+        """Delete expired PDFs and the oldest ones beyond ``max_files``; returns the count removed."""
+        now = time.time() if now is None else now
+        files = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                artifact_id, ext = os.path.splitext(entry.name)
+                if not _ARTIFACT_ID.match(artifact_id):
+                    continue
+                if ext == ".pdf":
+                    files.append((entry.stat().st_mtime, artifact_id, entry.path))
+                elif ext in (".pending", ".failed"):
+                    # Markers outlive their render only when the renderer died, or to report a failure
+                    limit = PENDING_TIMEOUT if ext == ".pending" else max(self.max_age, PENDING_TIMEOUT)
+                    if now - entry.stat().st_mtime > limit:
+                        _remove(entry.path)
+        files.sort()
+
+        doomed = []
+        if self.max_age > 0:
+            doomed = [f for f in files if now - f[0] > self.max_age]
+        kept = files[len(doomed):]
+        if self.max_files > 0 and len(kept) > self.max_files:
+            doomed.extend(kept[:len(kept) - self.max_files])
+
+        for _, artifact_id, path in doomed:
+            _remove(path)
+            with self._lock:
+                self._artifacts.pop(artifact_id, None)
+                data = self._memory.pop(artifact_id, None)
+                if data is not None:
+                    self._memory_used -= len(data)
+        return len(doomed)
+
+    def _remember(self, artifact_id, data):
+        with self._lock:
+            self._memory[artifact_id] = data
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _age(path):
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return float("inf")
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", name[:40]).strip("_") or "output"
+
+
+def _etag(stat):
+    return f'"{stat.st_size:x}-{int(stat.st_mtime * 1000):x}"'
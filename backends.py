@@ -0,0 +1,157 @@
+"""Pluggable inference backends for the transformer pipelines.
+
+Every backend returns a regular ``transformers`` pipeline, so the rest of the
+generator does not care which one is in use:
+
+* ``torch``  - stock PyTorch fp32 (the original behaviour)
+* ``int8``   - PyTorch with dynamic int8 quantization of the Linear layers
+* ``onnx``   - an exported ONNX Runtime graph (needs ``optimum[onnxruntime]``)
+
+Run ``python backends.py --backend int8`` to compare a backend against fp32.
+"""
+import argparse
+import difflib
+import json
+import os
+import time
+from datetime import datetime
+
+import config
+
+BACKENDS = {}
+
+
+def register_backend(name, loader):
+    """Register ``loader(task, model_name, threads)`` under ``name``."""
+    BACKENDS[name] = loader
+
+
+def load_pipeline(task, model_name, backend="torch", threads=0):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}' (available: {', '.join(sorted(BACKENDS))})")
+    set_num_threads(threads)
+    return BACKENDS[backend](task, model_name, threads)
+
+
+def set_num_threads(threads):
+    """Set intra-op parallelism for PyTorch; 0 keeps the library default."""
+    if threads and threads > 0:
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+def _load_torch(task, model_name, threads):
+    # transformers (and torch) are imported here so startup stays fast
+    from transformers import pipeline, set_seed
+
+    set_seed(datetime.now().microsecond)
+    return pipeline(task, model=model_name)
+
+
+def _load_int8(task, model_name, threads):
+    import torch
+
+    pipe = _load_torch(task, model_name, threads)
+    pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+
+def _load_onnx(task, model_name, threads):
+    try:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForCausalLM, ORTModelForSeq2SeqLM
+    except ImportError:
+        raise RuntimeError("The onnx backend requires `pip install optimum[onnxruntime]`")
+    from transformers import AutoTokenizer, pipeline
+
+    model_cls = ORTModelForSeq2SeqLM if task == "summarization" else ORTModelForCausalLM
+    options = onnxruntime.SessionOptions()
+    if threads and threads > 0:
+        options.intra_op_num_threads = threads
+
+    # Export once and reuse the graph on later starts
+    export_dir = os.path.join(config.ONNX_CACHE_DIR, model_name.replace("/", "--"))
+    if os.path.isdir(export_dir):
+        model = model_cls.from_pretrained(export_dir, session_options=options)
+    else:
+        model = model_cls.from_pretrained(model_name, export=True, session_options=options)
+        model.save_pretrained(export_dir)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return pipeline(task, model=model, tokenizer=tokenizer)
+
+
+register_backend("torch", _load_torch)
+register_backend("int8", _load_int8)
+register_backend("onnx", _load_onnx)
+
+
+PARITY_PROMPTS = {
+    "summarization": [
+        "The Amazon rainforest covers much of the Amazon basin of South America. The majority of the forest "
+        "is contained within Brazil, with 60% of the rainforest, followed by Peru with 13% and Colombia with "
+        "10%. It represents over half of the planet's remaining rainforests and comprises the largest and "
+        "most biodiverse tract of tropical rainforest in the world.",
+        "Quantum computing is a type of computation that harnesses the collective properties of quantum "
+        "states, such as superposition, interference, and entanglement, to perform calculations. The devices "
+        "that perform quantum computations are known as quantum computers.",
+    ],
+    "text-generation": [
+        "Write a 600-word story about a lighthouse keeper:\n\n",
+        "Write a 600-word story about a lone pirate's last voyage:\n\n",
+    ],
+}
+
+
+def check_parity(task, model_name, backend, prompts=None, threads=0, **generate_kwargs):
+    """Compare a backend's greedy outputs and latency against fp32 PyTorch."""
+    prompts = prompts or PARITY_PROMPTS[task]
+    key = "summary_text" if task == "summarization" else "generated_text"
+    generate_kwargs.setdefault("do_sample", False)
+    generate_kwargs.setdefault("max_length", 120)
+
+    def run(pipe):
+        outputs, start = [], time.time()
+        for prompt in prompts:
+            out = pipe(prompt, **generate_kwargs)[0]
+            outputs.append(out[key])
+        return outputs, (time.time() - start) / len(prompts)
+
+    reference, reference_time = run(load_pipeline(task, model_name, "torch", threads))
+    candidate, candidate_time = run(load_pipeline(task, model_name, backend, threads))
+
+    similarity = [
+        difflib.SequenceMatcher(None, ref.split(), cand.split()).ratio()
+        for ref, cand in zip(reference, candidate)
+    ]
+    return {
+        "task": task,
+        "model": model_name,
+        "backend": backend,
+        "exact_match": sum(ref == cand for ref, cand in zip(reference, candidate)) / len(prompts),
+        "mean_similarity": round(sum(similarity) / len(similarity), 4),
+        "min_similarity": round(min(similarity), 4),
+        "fp32_seconds": round(reference_time, 3),
+        "backend_seconds": round(candidate_time, 3),
+        "speedup": round(reference_time / candidate_time, 2) if candidate_time else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an inference backend against fp32 PyTorch")
+    parser.add_argument("--task", choices=sorted(PARITY_PROMPTS), default="summarization")
+    parser.add_argument("--model", default=None, help="defaults to the configured model for the task")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), required=True)
+    parser.add_argument("--threads", type=int, default=config.INFERENCE_THREADS)
+    parser.add_argument("--min-similarity", type=float, default=0.9)
+    args = parser.parse_args()
+
+    model_name = args.model or (config.SUMMARY_MODEL if args.task == "summarization" else config.STORY_MODEL)
+    report = check_parity(args.task, model_name, args.backend, threads=args.threads)
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["min_similarity"] >= args.min_similarity else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Bulk generation from a JSONL file of ``{"prompt": ..., "content_type": ...}`` records.
+
+Records are streamed from the input file and spread across a process pool;
+each process loads the models once. Results are appended to an output JSONL
+manifest as they complete and flushed to disk, so an interrupted run can be
+resumed: records whose id already has an ``ok`` or ``invalid`` entry in the
+manifest are skipped. A record's id is its ``id`` field, or ``line-<n>`` when absent.
+PDFs go to their own directory (``pdfs/`` next to the manifest by default),
+never to ``PDF_OUTPUT_DIR``, so the API server's cleanup cannot delete them.
+
+    python batch.py topics.jsonl results.jsonl --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import config
+
+_generator = None
+
+
+def _init_worker(pdf_dir):
+    global _generator
+    from generator import RobustContentGenerator
+
+    _generator = RobustContentGenerator()
+    # The manifest points at these PDFs, so they live beside it and are never swept
+    _generator.artifacts.root = pdf_dir
+    _generator.artifacts.max_age = 0
+    _generator.artifacts.max_files = 0
+    _generator.warm_up(config.PRELOAD_MODELS)
+
+
+def _generate(record_id, prompt, content_type):
+    start = time.time()
+    result = _generator.generate_content(prompt, content_type)
+    entry = {
+        "id": record_id,
+        "prompt": prompt,
+        "content_type": content_type,
+        "status": "error" if "error" in result else "ok",
+        "seconds": round(time.time() - start, 2),
+        "result": result,
+    }
+
+    if "pdf" in result:
+        artifact = _generator.artifacts.wait(result["pdf"][:-4], timeout=config.BATCH_JOB_PDF_TIMEOUT)
+        entry["pdf_path"] = artifact.path if artifact is not None and artifact.status == "ready" else None
+    return entry
+
+
+def read_records(path):
+    """Yield ``(record_id, record)`` pairs; malformed lines yield ``record=None``."""
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                yield f"line-{lineno}", None
+                continue
+            yield str(record.get("id") or f"line-{lineno}"), record
+
+
+def completed_ids(manifest_path):
+    done = set()
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            # Invalid records fail the same way on every retry; only errors are worth redoing
+            if isinstance(entry, dict) and entry.get("status") in ("ok", "invalid"):
+                done.add(entry["id"])
+    return done
+
+
+def run_batch(input_path, output_path, processes=2, resume=True, progress=None, pdf_dir=None):
+    """Generate every record in ``input_path``; returns counts per outcome."""
+    counts = {"ok": 0, "error": 0, "invalid": 0, "skipped": 0}
+    done = completed_ids(output_path) if resume else set()
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    pdf_dir = pdf_dir or os.path.join(directory or ".", "pdfs")
+
+    def record(out, entry):
+        out.write(json.dumps(entry) + "\n")
+        out.flush()
+        os.fsync(out.fileno())
+        counts[entry["status"]] += 1
+        if progress:
+            progress(dict(counts))
+
+    # spawn keeps workers independent of the (possibly multi-threaded) parent
+    context = multiprocessing.get_context("spawn")
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(processes, mp_context=context, initializer=_init_worker, initargs=(pdf_dir,)) as pool:
+        pending = set()
+        for record_id, item in read_records(input_path):
+            if record_id in done:
+                counts["skipped"] += 1
+                continue
+            if not item or not item.get("prompt"):
+                record(out, {"id": record_id, "status": "invalid", "error": "Record needs a prompt"})
+                continue
+
+            # Bound in-flight work so huge inputs are streamed, not loaded
+            if len(pending) >= processes * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(out, future.result())
+
+            pending.add(pool.submit(_generate, record_id, item["prompt"], item.get("content_type", "summary")))
+
+        for future in wait(pending).done:
+            record(out, future.result())
+
+    return counts
+
+
+class BatchRun:
+    """A ``run_batch`` call running on a background thread.
+
+    Its progress is mirrored to ``store`` (a ``StateStore``) when given, so
+    any worker process can report it.
+    """
+
+    def __init__(self, batch_id, input_path, output_path, processes, store=None):
+        self.id = batch_id
+        self.input_path = input_path
+        self.output_path = output_path
+        self.store = store
+        self.status = "running"
+        self.counts = {}
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self._save()
+
+        self._thread = threading.Thread(
+            target=self._run, args=(processes,), name=f"batch-{batch_id}", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, processes):
+        try:
+            self.counts = run_batch(self.input_path, self.output_path, processes, progress=self._progress)
+            self.status = "done"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished = time.time()
+            self._save()
+
+    def _progress(self, counts):
+        self.counts = counts
+        self._save()
+
+    def _save(self):
+        if self.store is not None:
+            self.store.put(self.id, self.to_dict())
+
+    def to_dict(self):
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "counts": self.counts,
+            "error": self.error,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate content for every record of a JSONL file")
+    parser.add_argument("input", help="JSONL file of {prompt, content_type} records")
+    parser.add_argument("output", help="JSONL manifest of results (appended to when resuming)")
+    parser.add_argument("--processes", type=int, default=config.BATCH_JOB_PROCESSES)
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of skipping finished records")
+    parser.add_argument("--pdf-dir", help="where PDFs are written (default: pdfs/ next to the output manifest)")
+    args = parser.parse_args()
+
+    start = time.time()
+    counts = run_batch(
+        args.input,
+        args.output,
+        args.processes,
+        resume=not args.no_resume,
+        progress=lambda counts: print(f"\r{counts}", end="", flush=True),
+        pdf_dir=args.pdf_dir,
+    )
+    print(f"\n✅ Batch finished in {round(time.time() - start, 1)}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Dynamic micro-batching for the transformer pipelines.
+
+Callers block in ``MicroBatcher.submit`` while a single background thread
+collects concurrent requests for up to ``window_ms`` (or until
+``max_batch_size`` is reached) and runs them through the model as one
+padded batch.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    def __init__(self, run_batch, max_batch_size=8, window_ms=20, name="batcher"):
+        # run_batch(items, kwargs) -> list of results, one per item
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, item, **kwargs):
+        """Queue one input and wait for its result."""
+        return self.submit_async(item, **kwargs).result()
+
+    def submit_async(self, item, **kwargs):
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, kwargs, future))
+        return future
+
+    def _ensure_started(self):
+        # The worker is started lazily so that the batcher survives being
+        # created before a fork.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        # Only requests with identical generation kwargs can share a forward pass
+        groups = {}
+        for entry in batch:
+            groups.setdefault(_kwargs_key(entry[1]), []).append(entry)
+
+        for group in groups.values():
+            futures = [future for _, _, future in group]
+            try:
+                results = self.run_batch([item for item, _, _ in group], group[0][1])
+                if len(results) != len(futures):
+                    raise RuntimeError(f"{self.name}: batch returned {len(results)} results for {len(futures)} inputs")
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            except Exception as e:
+                # Fail whatever is still pending so no caller waits forever
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+def _kwargs_key(kwargs):
+    return tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
@@ -0,0 +1,116 @@
+"""Local stand-in for the Wikipedia and Unsplash endpoints.
+
+Serves canned search results, plaintext extracts, article HTML and a JPEG
+image with a configurable artificial latency, so benchmarks run without
+network access. Point the generator at it with ``WIKI_BASE_URL`` and
+``IMAGE_BASE_URL``.
+"""
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+PARAGRAPH = (
+    "{topic} has been studied for many years by researchers from a wide range of disciplines. "
+    "Its history spans several centuries, and its influence on society, the economy and culture "
+    "continues to grow as new discoveries are made and old assumptions are revisited."
+)
+
+
+def article_text(topic, paragraphs=40):
+    return "\n".join(f"{PARAGRAPH.format(topic=topic)} (Section {i + 1}.)" for i in range(paragraphs))
+
+
+def article_html(topic, paragraphs=40):
+    body = "".join(f"<p>{PARAGRAPH.format(topic=topic)} (Section {i + 1}.)</p>\n" for i in range(paragraphs))
+    return (
+        f"<!DOCTYPE html><html><head><title>{topic}</title></head><body>"
+        f"<div id=\"mw-content-text\"><div class=\"mw-parser-output\">{body}</div></div>"
+        f"<div id=\"footer\"><p>{'footer ' * 20}</p></div></body></html>"
+    )
+
+
+def _jpeg(width=600, height=400):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), (70, 130, 180)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class MockServer:
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=None, paragraphs=40):
+        # latency_ms: {"search": .., "extract": .., "page": .., "image": ..} in milliseconds
+        self.latency = {"search": 50, "extract": 80, "page": 150, "image": 120}
+        self.latency.update(latency_ms or {})
+        self.paragraphs = paragraphs
+        self.image = _jpeg()
+        self.hits = {name: 0 for name in self.latency}
+
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                params = urllib.parse.parse_qs(parsed.query)
+
+                if parsed.path == "/w/api.php" and "srsearch" in params:
+                    topic = params["srsearch"][0]
+                    self._reply("search", "application/json", json.dumps(
+                        {"query": {"search": [{"title": topic.title()}]}}
+                    ).encode())
+                elif parsed.path == "/w/api.php" and "titles" in params:
+                    title = params["titles"][0]
+                    self._reply("extract", "application/json", json.dumps(
+                        {"query": {"pages": {"1": {"title": title, "extract": article_text(title, server.paragraphs)}}}}
+                    ).encode())
+                elif parsed.path.startswith("/wiki/"):
+                    title = urllib.parse.unquote(parsed.path[len("/wiki/"):]).replace("_", " ")
+                    self._reply("page", "text/html; charset=utf-8", article_html(title, server.paragraphs).encode())
+                elif parsed.path.startswith("/600x400"):
+                    self._reply("image", "image/jpeg", server.image)
+                else:
+                    self.send_error(404)
+
+            def _reply(self, kind, content_type, body):
+                server.hits[kind] += 1
+                time.sleep(server.latency[kind] / 1000.0)
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,279 @@
+"""Offline benchmark for RobustContentGenerator and the FastAPI app.
+
+Runs entirely against the local mock server and, by default, stub models:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json
+
+Measures per-stage and end-to-end p50/p95/p99 latency, throughput of
+``/generate`` under N concurrent clients, PDF render time and peak RSS,
+and writes the numbers as JSON. With ``--compare`` it reports every
+latency that regressed by more than ``--threshold`` and exits non-zero.
+Pass ``--real-models`` to benchmark the configured transformer models.
+If the app cannot be imported the run fails; ``--skip-http`` measures the
+stages only.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_stages(generator, iterations):
+    """Time each stage of the summary and story paths on unique topics."""
+    stages = {name: [] for name in ("fetch_source", "summarize", "fetch_image", "render_pdf",
+                                    "summary_e2e", "story_e2e")}
+
+    for i in range(iterations):
+        topic = f"benchmark topic {i}"
+        content, seconds = timed(generator._fetch_source, topic)
+        stages["fetch_source"].append(seconds)
+        summary, seconds = timed(generator._summarize_with_paragraphs, content or topic, 400)
+        stages["summarize"].append(seconds)
+        image, seconds = timed(generator._fetch_image, topic, "infographic")
+        stages["fetch_image"].append(seconds)
+        _, seconds = timed(generator._render_pdf, {
+            "type": "summary", "topic": topic, "content": summary, "image": image,
+        })
+        stages["render_pdf"].append(seconds)
+
+        _, seconds = timed(generator.generate_content, f"end to end topic {i}", "summary")
+        stages["summary_e2e"].append(seconds)
+        _, seconds = timed(generator.generate_content, f"end to end story {i}", "story")
+        stages["story_e2e"].append(seconds)
+
+    return {name: percentiles(samples) for name, samples in stages.items()}
+
+
+def import_app(scratch):
+    """Import ``main``, laying out the ``app/`` package it expects when the checkout is flat.
+
+    ``main.py`` reads ``app.schemas`` and mounts ``app/static`` relative to the
+    working directory. A checkout with ``schemas.py`` and ``index.html`` next
+    to ``main.py`` gets that package built under ``scratch`` from those files.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cwd = os.getcwd()
+    try:
+        import app.schemas  # noqa: F401
+    except ImportError:
+        package = os.path.join(scratch, "app")
+        os.makedirs(os.path.join(package, "static"), exist_ok=True)
+        os.makedirs(os.path.join(package, "templates"), exist_ok=True)
+        open(os.path.join(package, "__init__.py"), "w").close()
+        shutil.copy(os.path.join(root, "schemas.py"), os.path.join(package, "schemas.py"))
+        if os.path.exists(os.path.join(root, "index.html")):
+            shutil.copy(os.path.join(root, "index.html"), os.path.join(package, "templates", "index.html"))
+        sys.modules.pop("app", None)
+        sys.path.insert(0, scratch)
+        cwd = scratch
+
+    previous = os.getcwd()
+    os.chdir(cwd)
+    try:
+        import main as app_module
+    finally:
+        os.chdir(previous)
+    return app_module
+
+
+def bench_http(app, concurrency_levels, requests_per_client):
+    """Throughput and latency of POST /generate under concurrent clients."""
+    import requests
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    results = {}
+    try:
+        for clients in concurrency_levels:
+            latencies, errors = [], 0
+            counter = iter(range(clients * requests_per_client))
+            lock = threading.Lock()
+
+            def client(client_id):
+                nonlocal errors
+                session = requests.Session()
+                for _ in range(requests_per_client):
+                    with lock:
+                        n = next(counter)
+                    start = time.perf_counter()
+                    response = session.post(
+                        f"http://127.0.0.1:{port}/generate",
+                        data={"prompt": f"http topic {clients}-{n}", "content_type": "summary"},
+                    )
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        if response.status_code == 200:
+                            latencies.append(elapsed)
+                        else:
+                            errors += 1
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(clients) as pool:
+                list(pool.map(client, range(clients)))
+            wall = time.perf_counter() - start
+
+            results[f"clients_{clients}"] = dict(
+                percentiles(latencies),
+                errors=errors,
+                throughput_rps=round(len(latencies) / wall, 2) if wall else 0.0,
+            )
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Return the latency metrics that got slower than ``threshold`` allows."""
+    regressions = []
+    for section in ("stages", "http"):
+        for name, metrics in current.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name, {})
+            # Baselines recorded while the HTTP section was skipped hold only a reason
+            if not isinstance(metrics, dict) or not isinstance(previous, dict):
+                continue
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if key in metrics and previous.get(key):
+                    change = (metrics[key] - previous[key]) / previous[key]
+                    if change > threshold:
+                        regressions.append({
+                            "metric": f"{section}.{name}.{key}",
+                            "baseline": previous[key],
+                            "current": metrics[key],
+                            "change": round(change, 3),
+                        })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the content generator")
+    parser.add_argument("--iterations", type=int, default=20, help="stage benchmark iterations")
+    parser.add_argument("--clients", default="1,4,8", help="comma separated concurrency levels for /generate")
+    parser.add_argument("--requests-per-client", type=int, default=5)
+    parser.add_argument("--network-latency-ms", type=float, default=None,
+                        help="override the mock server latency of every endpoint")
+    parser.add_argument("--model-batch-ms", type=float, default=40, help="stub model time per batch")
+    parser.add_argument("--model-item-ms", type=float, default=15, help="stub model time per batch item")
+    parser.add_argument("--real-models", action="store_true", help="use the configured models instead of stubs")
+    parser.add_argument("--local-index", help="serve summary sources from this local index before the mock server")
+    parser.add_argument("--skip-http", action="store_true", help="only run the stage benchmark")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    from benchmarks.mock_server import MockServer
+
+    latency = None
+    if args.network_latency_ms is not None:
+        latency = {name: args.network_latency_ms for name in ("search", "extract", "page", "image")}
+
+    with MockServer(latency_ms=latency) as mock, tempfile.TemporaryDirectory() as scratch:
+        # Settings are read when config is imported, so set them first
+        os.environ.update({
+            "WIKI_BASE_URL": mock.url,
+            "IMAGE_BASE_URL": mock.url,
+            "SOURCE_CACHE_PATH": os.path.join(scratch, "sources.db"),
+            "IMAGE_STORE_DIR": os.path.join(scratch, "images"),
+            "PDF_OUTPUT_DIR": os.path.join(scratch, "output"),
+            "BATCH_JOB_DIR": os.path.join(scratch, "batches"),
+            "LOCAL_INDEX_PATH": args.local_index or os.path.join(scratch, "index"),
+        })
+        if not args.real_models:
+            os.environ.update({"SUMMARY_BACKEND": "stub", "STORY_BACKEND": "stub"})
+
+        from benchmarks import stubs
+        stubs.register(args.model_batch_ms, args.model_item_ms)
+        from generator import RobustContentGenerator
+
+        results = {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "models": "real" if args.real_models else "stub",
+        }
+
+        generator = RobustContentGenerator()
+        _, load_seconds = timed(generator.warm_up)
+        results["model_load_seconds"] = round(load_seconds, 3)
+        results["stages"] = bench_stages(generator, args.iterations)
+
+        if not args.skip_http:
+            try:
+                app_module = import_app(scratch)
+            except Exception as e:
+                # A silently missing section would also drop out of --compare
+                raise SystemExit(f"❌ Could not import the app for the HTTP benchmark ({str(e)}); "
+                                 "pass --skip-http to measure the stages only")
+            levels = [int(level) for level in args.clients.split(",") if level.strip()]
+            results["http"] = bench_http(app_module.app, levels, args.requests_per_client)
+
+        results["mock_requests"] = dict(mock.hits)
+        results["peak_rss_mb"] = peak_rss_mb()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\n📊 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"⚠️ {regression['metric']}: {regression['baseline']} -> {regression['current']} ms "
+                  f"(+{regression['change'] * 100:.1f}%)")
+        if regressions:
+            raise SystemExit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
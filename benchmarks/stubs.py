@@ -0,0 +1,62 @@
+"""Tiny stand-ins for the BART and GPT-2 pipelines.
+
+They mimic the call signature and output shape of ``transformers``
+pipelines (including a tokenizer for the chunker) and sleep for a fixed
+per-batch plus per-item time, so batching, caching and queueing behave as
+they would with real models while the benchmark stays fast and offline.
+Registered as the ``stub`` inference backend.
+"""
+import time
+
+import backends
+
+STORY_TEXT = (
+    "The lighthouse keeper climbed the spiral stairs every evening, counting the steps as his father had done before him.\n"
+    "One night the lamp refused to light, and far out at sea a small boat was drifting toward the rocks without a sound.\n"
+    "He took the old oil lantern from its hook, rowed out into the dark water and guided the sailors safely into the harbour.\n"
+)
+
+
+class StubTokenizer:
+    pad_token_id = 0
+    eos_token_id = 0
+    padding_side = "left"
+
+    def encode(self, text, add_special_tokens=True, **kwargs):
+        return text.split()
+
+    def decode(self, ids, **kwargs):
+        return " ".join(ids)
+
+
+class StubModelConfig:
+    eos_token_id = 0
+
+
+class StubModel:
+    config = StubModelConfig()
+
+
+class StubPipeline:
+    def __init__(self, task, batch_ms=40, item_ms=15):
+        self.task = task
+        self.batch_ms = batch_ms
+        self.item_ms = item_ms
+        self.tokenizer = StubTokenizer()
+        self.model = StubModel()
+
+    def __call__(self, inputs, **kwargs):
+        single = isinstance(inputs, str)
+        items = [inputs] if single else list(inputs)
+        time.sleep((self.batch_ms + self.item_ms * len(items)) / 1000.0)
+
+        if self.task == "summarization":
+            max_words = kwargs.get("max_length") or 120
+            outputs = [{"summary_text": " ".join(text.split()[:max_words])} for text in items]
+        else:
+            outputs = [[{"generated_text": text + STORY_TEXT}] for text in items]
+        return outputs if not single else (outputs[0] if isinstance(outputs[0], list) else outputs)
+
+
+def register(batch_ms=40, item_ms=15):
+    backends.register_backend("stub", lambda task, model_name, threads: StubPipeline(task, batch_ms, item_ms))
@@ -0,0 +1,60 @@
+"""Token-aware splitting of long documents for map-reduce summarization."""
+import itertools
+import re
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(tokenizer, text):
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def iter_chunks(text, tokenizer, max_tokens):
+    """Lazily yield chunks of at most ``max_tokens`` tokens.
+
+    Chunks are built from whole paragraphs; a paragraph that is too long on
+    its own is split on sentence boundaries, and a sentence that is still too
+    long is cut on token boundaries.
+    """
+    current, current_tokens = [], 0
+    for piece, n in _pieces(text, tokenizer, max_tokens):
+        if current and current_tokens + n > max_tokens:
+            yield "\n\n".join(current)
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += n
+
+    if current:
+        yield "\n\n".join(current)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        group = list(itertools.islice(iterator, size))
+        if not group:
+            return
+        yield group
+
+
+def _pieces(text, tokenizer, max_tokens):
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+
+        n = count_tokens(tokenizer, paragraph)
+        if n <= max_tokens:
+            yield paragraph, n
+            continue
+
+        for sentence in _SENTENCE_END.split(paragraph):
+            n = count_tokens(tokenizer, sentence)
+            if n <= max_tokens:
+                yield sentence, n
+                continue
+
+            ids = tokenizer.encode(sentence, add_special_tokens=False)
+            for start in range(0, len(ids), max_tokens):
+                window = ids[start:start + max_tokens]
+                yield tokenizer.decode(window), len(window)
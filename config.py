@@ -0,0 +1,139 @@
+"""Runtime settings for the content generator.
+
+Every value can be overridden with an environment variable (or a ``.env``
+file next to ``main.py``).
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Micro-batching in front of the BART / GPT-2 pipelines
+BATCH_MAX_SIZE = _env_int("BATCH_MAX_SIZE", 8)
+BATCH_WINDOW_MS = _env_float("BATCH_WINDOW_MS", 20)
+
+# Job queue and inference worker pool behind /generate and /jobs
+JOB_QUEUE_SIZE = _env_int("JOB_QUEUE_SIZE", 64)
+JOB_WORKERS = _env_int("JOB_WORKERS", 4)
+JOB_RESULT_TTL = _env_float("JOB_RESULT_TTL", 3600)
+# SQLite file holding /jobs and /batch state for every worker process (empty keeps it per process)
+STATE_STORE_PATH = os.getenv("STATE_STORE_PATH", "cache/state.db")
+
+# Outbound HTTP (Wikipedia / Unsplash); the base URLs can point at a local stand-in
+WIKI_BASE_URL = os.getenv("WIKI_BASE_URL", "https://en.wikipedia.org").rstrip("/")
+IMAGE_BASE_URL = os.getenv("IMAGE_BASE_URL", "https://source.unsplash.com").rstrip("/")
+HTTP_POOL_PER_HOST = _env_int("HTTP_POOL_PER_HOST", 8)
+HTTP_FETCH_WORKERS = _env_int("HTTP_FETCH_WORKERS", 16)
+HTTP_TIMEOUT = _env_float("HTTP_TIMEOUT", 10)
+FETCH_DEADLINE = _env_float("FETCH_DEADLINE", 20)
+
+# Persistent cache of Wikipedia search results and article text (empty path disables)
+SOURCE_CACHE_PATH = os.getenv("SOURCE_CACHE_PATH", "cache/sources.db")
+SOURCE_CACHE_TTL = _env_float("SOURCE_CACHE_TTL", 7 * 24 * 3600)
+SOURCE_CACHE_MAX_ENTRIES = _env_int("SOURCE_CACHE_MAX_ENTRIES", 10000)
+SOURCE_CACHE_NEGATIVE_TTL = _env_float("SOURCE_CACHE_NEGATIVE_TTL", 600)
+
+# Memoization of finished generations (summaries are deterministic; stories are sampled)
+SUMMARY_MEMO_SIZE = _env_int("SUMMARY_MEMO_SIZE", 1024)
+MEMOIZE_STORIES = _env_bool("MEMOIZE_STORIES", False)
+STORY_MEMO_SIZE = _env_int("STORY_MEMO_SIZE", 256)
+
+# Models, loaded lazily; PRELOAD_MODELS lists content types warmed up at startup
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "facebook/bart-large-cnn")
+STORY_MODEL = os.getenv("STORY_MODEL", "gpt2-medium")
+PRELOAD_MODELS = [name.strip() for name in os.getenv("PRELOAD_MODELS", "summary,story").split(",") if name.strip()]
+
+# Map-reduce summarization of long sources
+SOURCE_MAX_CHARS = _env_int("SOURCE_MAX_CHARS", 40000)
+SUMMARY_CHUNK_TOKENS = _env_int("SUMMARY_CHUNK_TOKENS", 900)
+SUMMARY_PARTIAL_TOKENS = _env_int("SUMMARY_PARTIAL_TOKENS", 160)
+SUMMARY_MAX_CHUNKS = _env_int("SUMMARY_MAX_CHUNKS", 32)
+SUMMARY_MAX_DEPTH = _env_int("SUMMARY_MAX_DEPTH", 3)
+
+# Server-sent-events story streaming
+STREAM_MAX_CONCURRENT = _env_int("STREAM_MAX_CONCURRENT", 4)
+
+# Inference backends per model: torch (fp32), int8 (dynamic quantization) or onnx
+SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "torch")
+STORY_BACKEND = os.getenv("STORY_BACKEND", "torch")
+INFERENCE_THREADS = _env_int("INFERENCE_THREADS", 0)
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "cache/onnx")
+
+# Wikipedia text extraction: "extracts" (plaintext API, HTML fallback) or "html" (streamed page parse)
+WIKI_EXTRACT_MODE = os.getenv("WIKI_EXTRACT_MODE", "extracts")
+
+# Content-addressed image store (images are downscaled once to PDF resolution)
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "cache/images")
+IMAGE_STORE_MAX_MB = _env_int("IMAGE_STORE_MAX_MB", 200)
+IMAGE_MEMORY_ITEMS = _env_int("IMAGE_MEMORY_ITEMS", 64)
+
+# Background PDF rendering and downloads
+PDF_OUTPUT_DIR = os.getenv("PDF_OUTPUT_DIR", "output")
+PDF_RENDER_WORKERS = _env_int("PDF_RENDER_WORKERS", 2)
+PDF_MEMORY_MB = _env_int("PDF_MEMORY_MB", 64)
+PDF_DOWNLOAD_WAIT = _env_float("PDF_DOWNLOAD_WAIT", 10)
+PDF_MAX_AGE = _env_float("PDF_MAX_AGE", 7 * 24 * 3600)
+PDF_MAX_FILES = _env_int("PDF_MAX_FILES", 5000)
+
+# Bulk JSONL generation (batch.py and /batch)
+BATCH_JOB_PROCESSES = _env_int("BATCH_JOB_PROCESSES", 2)
+BATCH_MAX_PROCESSES = _env_int("BATCH_MAX_PROCESSES", 4)
+BATCH_JOB_DIR = os.getenv("BATCH_JOB_DIR", "batches")
+BATCH_JOB_PDF_TIMEOUT = _env_float("BATCH_JOB_PDF_TIMEOUT", 120)
+BATCH_STATE_TTL = _env_float("BATCH_STATE_TTL", 7 * 24 * 3600)
+
+# Pre-fork serving (serve.py): workers sharing one copy of the preloaded models
+SERVE_WORKERS = _env_int("SERVE_WORKERS", 2)
+
+# Per-request latency budgets (deadline_ms on /generate)
+DEADLINE_FETCH_SHARE = _env_float("DEADLINE_FETCH_SHARE", 0.4)
+DEADLINE_MIN_INFERENCE_MS = _env_int("DEADLINE_MIN_INFERENCE_MS", 500)
+DEADLINE_RESERVE_MS = _env_int("DEADLINE_RESERVE_MS", 150)
+DEADLINE_SHARE_BUCKET_MS = _env_int("DEADLINE_SHARE_BUCKET_MS", 1000)
+
+# Source retrieval for summaries: backends tried in order ("local" BM25 index, "wikipedia")
+RETRIEVAL_BACKENDS = [
+    name.strip() for name in os.getenv("RETRIEVAL_BACKENDS", "local,wikipedia").split(",") if name.strip()
+]
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "cache/index")
+LOCAL_INDEX_MIN_MATCH = _env_float("LOCAL_INDEX_MIN_MATCH", 0.5)
+
+# Model residency (model_manager.py): memory budget in MB (0 = unlimited), idle
+# eviction after MODEL_IDLE_TIMEOUT seconds (0 = never) and models never evicted
+MODEL_MEMORY_MB = _env_int("MODEL_MEMORY_MB", 0)
+MODEL_IDLE_TIMEOUT = _env_float("MODEL_IDLE_TIMEOUT", 0)
+MODEL_PINNED = [name.strip() for name in os.getenv("MODEL_PINNED", "").split(",") if name.strip()]
+# Size to plan for before a model's first load, e.g. "summary:1700,story:550"; by
+# default it is read from the weight files in the Hugging Face cache
+MODEL_SIZE_MB = {
+    name.strip(): int(size)
+    for name, _, size in (item.partition(":") for item in os.getenv("MODEL_SIZE_MB", "").split(","))
+    if name.strip() and size.strip()
+}
+
+# Popular-topic pre-generation (prewarm.py)
+PREWARM_ENABLED = _env_bool("PREWARM_ENABLED", False)
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH", "cache/requests.jsonl")
+REQUEST_LOG_MAX_MB = _env_int("REQUEST_LOG_MAX_MB", 50)
+PREWARM_TOP_N = _env_int("PREWARM_TOP_N", 20)
+PREWARM_INTERVAL = _env_float("PREWARM_INTERVAL", 30)
+PREWARM_HALF_LIFE = _env_float("PREWARM_HALF_LIFE", 3600)
+PREWARM_TTL = _env_float("PREWARM_TTL", 6 * 3600)
+PREWARM_STORE_SIZE = _env_int("PREWARM_STORE_SIZE", 100)
+PREWARM_STORE_PATH = os.getenv("PREWARM_STORE_PATH", "cache/prewarm.db")
+PREWARM_MAX_LOAD = _env_float("PREWARM_MAX_LOAD", 0.5)
+PREWARM_NICE = _env_int("PREWARM_NICE", 19)
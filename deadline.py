@@ -0,0 +1,43 @@
+"""Per-request latency budgets.
+
+A ``Deadline`` wraps the ``time.monotonic()`` value by which a request must
+answer. Every stage asks it how much time is left: fetches get a share of
+the remaining budget as their own deadline, generation stops decoding when
+it runs low, and stages that cannot finish in time fall back instead of
+starting. ``Deadline()`` without an expiry never runs low.
+"""
+import time
+
+
+class Deadline:
+    def __init__(self, expires_at=None):
+        self.expires_at = expires_at
+
+    @property
+    def bounded(self):
+        return self.expires_at is not None
+
+    def remaining(self):
+        """Seconds left, or None for an unbounded deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def running_low(self, reserve):
+        """True once no more than ``reserve`` seconds are left."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= reserve
+
+    def cap(self, seconds, reserve=0.0):
+        """A monotonic deadline ``seconds`` from now, never later than the budget minus ``reserve``."""
+        deadline = time.monotonic() + seconds
+        if self.expires_at is None:
+            return deadline
+        return min(deadline, self.expires_at - reserve)
+
+    def share(self, fraction, seconds):
+        """A monotonic deadline that spends at most ``fraction`` of the remaining budget."""
+        remaining = self.remaining()
+        if remaining is None:
+            return time.monotonic() + seconds
+        return time.monotonic() + min(seconds, remaining * fraction)
@@ -0,0 +1,100 @@
+"""Lightweight extraction of Wikipedia article paragraphs.
+
+``paragraphs_from_stream`` feeds the HTML response to an incremental
+``html.parser`` as it downloads and stops reading as soon as enough text has
+been collected, instead of building a full BeautifulSoup tree of the page.
+A ``requests`` timeout only limits each socket read, so the stream also
+checks the caller's deadline between chunks and gives up once it passes.
+``paragraphs_from_text`` applies the same paragraph rules to the plaintext
+returned by the MediaWiki extracts API.
+"""
+import codecs
+import time
+from html.parser import HTMLParser
+
+MIN_PARAGRAPH_CHARS = 50
+
+
+class ParagraphExtractor(HTMLParser):
+    """Collects the text of ``<p>`` elements inside ``#mw-content-text``."""
+
+    def __init__(self, max_chars):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.content = ""
+        self.done = False
+
+        self._content_depth = 0  # nesting of <div>s inside #mw-content-text
+        self._paragraph = None
+
+    def handle_starttag(self, tag, attrs):
+        if self._content_depth == 0:
+            if dict(attrs).get("id") == "mw-content-text":
+                self._content_depth = 1
+            return
+
+        if tag == "div":
+            self._content_depth += 1
+        elif tag == "p":
+            # </p> is optional in HTML, so a new <p> closes the previous one
+            self._finish_paragraph()
+            self._paragraph = []
+
+    def handle_endtag(self, tag):
+        if self._content_depth == 0:
+            return
+
+        if tag == "p":
+            self._finish_paragraph()
+        elif tag == "div":
+            self._content_depth -= 1
+            if self._content_depth == 0:
+                self._finish_paragraph()
+                self.done = True
+
+    def handle_data(self, data):
+        if self._paragraph is not None:
+            self._paragraph.append(data)
+
+    def _finish_paragraph(self):
+        if self._paragraph is None:
+            return
+        text = "".join(self._paragraph).strip()
+        self._paragraph = None
+
+        if self.done or len(text) <= MIN_PARAGRAPH_CHARS:
+            return
+        self.content += text + "\n\n"
+        if len(self.content) > self.max_chars:
+            self.done = True
+
+
+def paragraphs_from_stream(response, max_chars, chunk_size=16384, deadline=None):
+    """Extract paragraphs from a streamed ``requests`` response, closing it early.
+
+    Raises ``TimeoutError`` once ``time.monotonic()`` passes ``deadline``, so a
+    page cut off mid-download is never mistaken for the whole article.
+    """
+    extractor = ParagraphExtractor(max_chars)
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            extractor.feed(decoder.decode(chunk))
+            if extractor.done:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"{response.url} was still downloading at the deadline")
+    finally:
+        response.close()
+    return extractor.content
+
+
+def paragraphs_from_text(text, max_chars):
+    content = ""
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if len(paragraph) > MIN_PARAGRAPH_CHARS:
+            content += paragraph + "\n\n"
+            if len(content) > max_chars:
+                break
+    return content
@@ -0,0 +1,51 @@
+"""Pooled, concurrent HTTP access for the Wikipedia and Unsplash fetches.
+
+A single keep-alive ``requests.Session`` is shared by every request, with a
+bounded connection pool per host. Independent fetches are overlapped on a
+thread pool via ``HttpClient.submit``.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpClient:
+    def __init__(self, headers=None, pool_per_host=8, max_workers=16, timeout=10):
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        # pool_block caps concurrent connections per host instead of opening extras
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_per_host, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get(self, url, deadline=None, **kwargs):
+        """GET ``url``, never waiting past ``deadline`` (a ``time.monotonic()`` value)."""
+        kwargs.setdefault("timeout", remaining_timeout(deadline, self.timeout))
+        return self.session.get(url, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run ``fn`` on the fetch pool and return a future."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="fetch")
+        # Carry the caller's context so timing spans land in the right request
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, fn, *args, **kwargs)
+
+
+def remaining_timeout(deadline, cap):
+    if deadline is None:
+        return cap
+    return max(0.1, min(cap, deadline - time.monotonic()))
@@ -1,60 +1,280 @@
 
-import requests
-from bs4 import BeautifulSoup
 import urllib.parse
-from transformers import pipeline, set_seed
 import textwrap
-import warnings
-from PIL import Image
+import contextvars
 from io import BytesIO
+import warnings
 import os
-import random
-from datetime import datetime
+import itertools
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+import config
+from batching import MicroBatcher
+from fetcher import HttpClient
+from source_cache import SourceCache, normalize_query
+from memo import ResultCache, SingleFlight, memo_key
+from backends import load_pipeline
+from chunking import batched, count_tokens, iter_chunks
+from image_store import ImageStore
+from extract import paragraphs_from_stream, paragraphs_from_text
+from artifacts import ArtifactStore
+from local_index import LocalIndex
+from model_manager import ModelManager
+from prewarm import CONTENT_TYPES as PREWARM_CONTENT_TYPES, Preempted, PrewarmStore
+from deadline import Deadline
+import metrics
 
 warnings.filterwarnings('ignore')
 
+# Set while generating background work: a callable that returns True once live requests need the CPU
+_yield_to = contextvars.ContextVar("yield_to", default=None)
+
 
 class RobustContentGenerator:
+    # content type -> (pipeline task, model id, inference backend)
+    MODELS = {
+        "summary": ("summarization", config.SUMMARY_MODEL, config.SUMMARY_BACKEND),
+        "story": ("text-generation", config.STORY_MODEL, config.STORY_BACKEND),
+    }
+
     def __init__(self):
-        set_seed(datetime.now().microsecond)
-        self.summarizer = self._safe_load_model("summarization", "facebook/bart-large-cnn")
-        self.story_gen = self._safe_load_model("text-generation", "gpt2-medium")
+        # Pipelines are loaded on first use (or by warm_up), not at import time, and
+        # may be evicted again to stay within the memory budget
+        self.models = ModelManager(
+            self.MODELS,
+            self._load_model,
+            config.MODEL_MEMORY_MB * 1024 * 1024,
+            config.MODEL_IDLE_TIMEOUT,
+            config.MODEL_PINNED,
+            {name: size * 1024 * 1024 for name, size in config.MODEL_SIZE_MB.items()}
+        )
+
+        self.summary_batcher = MicroBatcher(
+            self._run_summary_batch, config.BATCH_MAX_SIZE, config.BATCH_WINDOW_MS, name="summary-batcher"
+        )
+        self.story_batcher = MicroBatcher(
+            self._run_story_batch, config.BATCH_MAX_SIZE, config.BATCH_WINDOW_MS, name="story-batcher"
+        )
 
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-
-    def _safe_load_model(self, task, model_name):
+        self.http = HttpClient(
+            self.headers, config.HTTP_POOL_PER_HOST, config.HTTP_FETCH_WORKERS, config.HTTP_TIMEOUT
+        )
+        self.source_cache = None
+        if config.SOURCE_CACHE_PATH:
+            self.source_cache = SourceCache(
+                config.SOURCE_CACHE_PATH,
+                config.SOURCE_CACHE_TTL,
+                config.SOURCE_CACHE_MAX_ENTRIES,
+                config.SOURCE_CACHE_NEGATIVE_TTL
+            )
+
+        self.local_index = None
+        if config.LOCAL_INDEX_PATH and os.path.exists(os.path.join(config.LOCAL_INDEX_PATH, "meta.json")):
+            self.local_index = LocalIndex(config.LOCAL_INDEX_PATH)
+
+        # Source backend name -> fetch(query, deadline), tried in RETRIEVAL_BACKENDS order
+        self.source_backends = {
+            "local": self._fetch_local_content,
+            "wikipedia": self._fetch_web_content,
+        }
+        for name in config.RETRIEVAL_BACKENDS:
+            if name not in self.source_backends:
+                print(f"⚠️ Unknown retrieval backend: {name}")
+
+        self.image_store = ImageStore(
+            config.IMAGE_STORE_DIR,
+            config.IMAGE_STORE_MAX_MB * 1024 * 1024,
+            config.IMAGE_MEMORY_ITEMS
+        )
+
+        self.artifacts = ArtifactStore(
+            config.PDF_OUTPUT_DIR,
+            self._render_pdf,
+            config.PDF_RENDER_WORKERS,
+            config.PDF_MEMORY_MB * 1024 * 1024,
+            max_age=config.PDF_MAX_AGE,
+            max_files=config.PDF_MAX_FILES
+        )
+
+        self.inflight = SingleFlight()
+        self.summary_memo = ResultCache(config.SUMMARY_MEMO_SIZE, name="summary_memo")
+        self.story_memo = ResultCache(config.STORY_MEMO_SIZE if config.MEMOIZE_STORIES else 0, name="story_memo")
+
+        # Results pre-generated for popular topics (see prewarm.py)
+        self.prewarmed = None
+        if config.PREWARM_ENABLED:
+            self.prewarmed = PrewarmStore(
+                config.PREWARM_STORE_PATH, config.PREWARM_STORE_SIZE, config.PREWARM_TTL
+            )
+
+    @property
+    def summarizer(self):
+        return self.models.get("summary")
+
+    @property
+    def story_gen(self):
+        return self.models.get("story")
+
+    def _load_model(self, task, model_name, backend):
+        with metrics.span("model_load"):
+            model = self._safe_load_model(task, model_name, backend)
+        if model is None:
+            metrics.MODEL_LOAD_FAILURES.inc(model=model_name, backend=backend)
+        return model
+
+    def warm_up(self, names=None):
+        """Load the given models (all by default) before the first request needs them."""
+        for name in names if names is not None else self.MODELS:
+            if name in self.MODELS:
+                self.models.get(name)
+
+    def start_warm_up(self, names=None):
+        thread = threading.Thread(target=self.warm_up, args=(names,), name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def loaded_pipelines(self):
+        return self.models.loaded()
+
+    def model_status(self):
+        return self.models.status()
+
+    def _safe_load_model(self, task, model_name, backend="torch"):
         try:
-            return pipeline(task, model=model_name)
+            try:
+                pipe = load_pipeline(task, model_name, backend, config.INFERENCE_THREADS)
+            except Exception as e:
+                if backend == "torch":
+                    raise
+                metrics.fallback("torch_backend", e)
+                pipe = load_pipeline(task, model_name, "torch", config.INFERENCE_THREADS)
+            if task == "text-generation" and pipe.tokenizer.pad_token_id is None:
+                # GPT-2 has no pad token; pad on the left with EOS so batched prompts line up
+                pipe.tokenizer.pad_token_id = pipe.model.config.eos_token_id
+                pipe.tokenizer.padding_side = "left"
+            return pipe
         except Exception as e:
             print(f"⚠️ Could not load {model_name}: {str(e)}")
             return None
 
-    def generate_content(self, prompt, content_type="summary"):
+    def generate_content(self, prompt, content_type="summary", deadline=None, use_prewarmed=True, yield_to=None):
+        """Generate a summary or story; ``deadline`` is an optional ``time.monotonic()`` budget.
+
+        ``yield_to`` marks background work. Its inference runs on the calling
+        thread instead of the shared batchers, and it raises ``Preempted``
+        between batches as soon as ``yield_to()`` is True, before the image
+        is awaited or the PDF written.
+        """
+        token = _yield_to.set(yield_to)
         try:
             if content_type == "summary":
-                return self._generate_summary(prompt)
+                handler = self._generate_summary
             elif content_type == "story":
-                return self._generate_story(prompt)
+                handler = self._generate_story
             else:
                 return {"error": "Invalid content type"}
+
+            if use_prewarmed and self.prewarmed is not None and content_type in PREWARM_CONTENT_TYPES:
+                result = self.prewarmed.get(content_type, prompt)
+                if result is not None:
+                    result['prewarmed'] = True
+                    result['timings'] = {}
+                    return result
+
+            budget = Deadline(deadline)
+
+            def run(prompt):
+                with metrics.request_fallbacks() as degraded:
+                    result = handler(prompt, budget)
+                if "error" not in result:
+                    result['degraded'] = degraded
+                return result
+
+            with metrics.request_timings() as timings:
+                if (content_type == "story" and not config.MEMOIZE_STORIES) or yield_to is not None:
+                    # Live requests must never wait on (or share) background work that may stop early
+                    result = run(prompt)
+                else:
+                    # Identical concurrent requests share one fetch, inference and PDF;
+                    # budgeted requests only share with deadlines in the same window
+                    key = (content_type, normalize_query(prompt), _deadline_bucket(budget))
+                    wait = None
+                    if budget.bounded:
+                        wait = max(0.0, budget.remaining() - _min_inference())
+                    try:
+                        result = dict(self.inflight.do(key, run, prompt, timeout=wait))
+                    except FutureTimeout:
+                        # The shared call outlives this budget; what is left only covers the fallbacks
+                        result = run(prompt)
+
+            if "error" not in result:
+                result['timings'] = timings
+            return result
+        except Preempted:
+            raise
         except Exception as e:
             return {"error": f"Generation failed: {str(e)}"}
+        finally:
+            _yield_to.reset(token)
+
+    def cache_stats(self):
+        return {
+            "summary_memo": self.summary_memo.stats(),
+            "story_memo": self.story_memo.stats(),
+            "inflight_shared": self.inflight.shared,
+            "prewarmed": self.prewarmed.stats() if self.prewarmed is not None else None,
+        }
+
+    def _run_summary_batch(self, texts, kwargs):
+        with metrics.span("summary_batch"):
+            outputs = self.summarizer(texts, batch_size=len(texts), **kwargs)
+        return [out[0] if isinstance(out, list) else out for out in outputs]
+
+    def _run_story_batch(self, prompts, kwargs):
+        with metrics.span("story_batch"):
+            outputs = self.story_gen(prompts, batch_size=len(prompts), **kwargs)
+        return [out[0] if isinstance(out, list) else out for out in outputs]
 
-    def _generate_summary(self, topic):
+    def _generate_summary(self, topic, budget=None):
         try:
-            content = self._fetch_web_content(topic) or f"Provide a detailed summary about {topic}."
+            budget = budget or Deadline()
+            deadline = budget.cap(config.FETCH_DEADLINE, _reserve())
+            # The image does not depend on the summary, so fetch it alongside everything else
+            image_future = self.http.submit(self._fetch_image, topic, "infographic", deadline)
+
+            content = None
+            if budget.running_low(_min_inference()):
+                # Not enough time to read a source and still summarize it
+                metrics.fallback("source_deadline")
+            else:
+                with metrics.span("fetch_source"):
+                    content = self._fetch_source(
+                        topic, budget.share(config.DEADLINE_FETCH_SHARE, config.FETCH_DEADLINE)
+                    )
+            if not content:
+                metrics.fallback("source")
+                content = f"Provide a detailed summary about {topic}."
 
             if self.summarizer is None:
+                metrics.fallback("summary_model")
+                summary_text = self._fallback_summary(topic)
+            elif budget.running_low(_min_inference()):
+                metrics.fallback("summary_deadline")
                 summary_text = self._fallback_summary(topic)
             else:
-                summary_text = self._summarize_with_paragraphs(content, 400)
+                with metrics.span("summarize"):
+                    summary_text = self._summarize_with_paragraphs(content, 400, budget)
 
-            image_path = self._fetch_image(topic, "infographic")
+            image_path = self._collect_image(image_future, deadline)
 
             result = {
                 'type': 'summary',
@@ -67,118 +287,376 @@ class RobustContentGenerator:
             self._save_pdf(result)
 
             return result
+        except Preempted:
+            image_future.cancel()
+            raise
         except Exception as e:
             return {"error": f"Summary generation failed: {str(e)}"}
 
-    def _generate_story(self, prompt):
+    def _generate_story(self, prompt, budget=None):
         try:
+            budget = budget or Deadline()
+            deadline = budget.cap(config.FETCH_DEADLINE, _reserve())
+            image_future = self.http.submit(self._fetch_image, prompt, "art", deadline)
+
             if self.story_gen is None:
+                metrics.fallback("story_model")
+                story = self._fallback_story(prompt)
+            elif budget.running_low(_min_inference()):
+                metrics.fallback("story_deadline")
                 story = self._fallback_story(prompt)
             else:
-                story = self._generate_story_with_paragraphs(prompt, 600)
+                with metrics.span("story_generate"):
+                    story = self._generate_story_with_paragraphs(prompt, 600, budget)
 
-            image_path = self._fetch_image(prompt, "art")
+            image_path = self._collect_image(image_future, deadline)
+            return self._story_result(prompt, story, image_path)
+        except Exception as e:
+            return {"error": f"Story generation failed: {str(e)}"}
 
-            result = {
-                'type': 'story',
-                'title': prompt,
-                'content': story,
-                'image': image_path,
-                'word_count': len(story.split())
-            }
+    def _story_result(self, prompt, story, image_path):
+        result = {
+            'type': 'story',
+            'title': prompt,
+            'content': story,
+            'image': image_path,
+            'word_count': len(story.split())
+        }
 
-            self._save_pdf(result)
+        self._save_pdf(result)
 
-            return result
-        except Exception as e:
-            return {"error": f"Story generation failed: {str(e)}"}
+        return result
 
-    def _summarize_with_paragraphs(self, text, word_count):
-        try:
-            if len(text.split()) < 50:
-                text = f"{text} " * 10
+    def stream_story(self, prompt, cancel_event=None, word_count=600):
+        """Generate a story, yielding ("token", text) pieces as GPT-2 decodes them.
 
-            summary = self.summarizer(
-                text[:10000],
-                max_length=word_count+50,
-                min_length=max(100, word_count-100),
-                do_sample=False
-            )[0]['summary_text']
+        The paragraph clean-up and the PDF happen once decoding finishes, and
+        the final ("result", dict) event carries the same payload as
+        generate_content. Setting ``cancel_event`` stops decoding early.
+        """
+        from transformers import StoppingCriteriaList, TextIteratorStreamer
+
+        deadline = time.monotonic() + config.FETCH_DEADLINE
+        image_future = self.http.submit(self._fetch_image, prompt, "art", deadline)
+
+        pipe = self.story_gen
+        if pipe is None:
+            metrics.fallback("story_model")
+            story = self._fallback_story(prompt)
+            yield "token", story
+        else:
+            story_prompt = self._story_prompt(prompt, word_count)
+            params = self._story_params(word_count)
+            params.pop("truncation")
+
+            inputs = pipe.tokenizer(story_prompt, return_tensors="pt")
+            streamer = TextIteratorStreamer(pipe.tokenizer, skip_prompt=True, skip_special_tokens=True)
+            stopping = StoppingCriteriaList([_CancelCriteria(cancel_event)])
+            errors = []
+
+            def decode():
+                try:
+                    pipe.model.generate(
+                        **inputs,
+                        **params,
+                        streamer=streamer,
+                        stopping_criteria=stopping,
+                        pad_token_id=pipe.tokenizer.pad_token_id
+                    )
+                except Exception as e:
+                    metrics.fallback("story_inference", e)
+                    errors.append(e)
+                    streamer.end()
+
+            thread = threading.Thread(target=decode, name="story-stream", daemon=True)
+            thread.start()
+
+            pieces = []
+            for piece in streamer:
+                pieces.append(piece)
+                if piece:
+                    yield "token", piece
+            thread.join()
+
+            if cancel_event is not None and cancel_event.is_set():
+                image_future.cancel()
+                return
+            if errors:
+                story = self._fallback_story(prompt)
+            else:
+                story = self._story_paragraphs(story_prompt + "".join(pieces))
+
+        image_path = self._collect_image(image_future, deadline)
+        yield "result", self._story_result(prompt, story, image_path)
+
+    def _summarize_with_paragraphs(self, text, word_count, budget=None):
+        try:
+            summary = self._map_reduce_summary(text, word_count, budget)
 
             wrapped = textwrap.wrap(summary, width=110)
             return "\n\n".join([" ".join(wrapped[i:i+8]) for i in range(0, len(wrapped), 8)])
-        except:
+        except Preempted:
+            raise
+        except Exception as e:
+            metrics.fallback("summary_inference", e)
             return self._fallback_summary(text)
 
-    def _generate_story_with_paragraphs(self, prompt, word_count):
+    def _map_reduce_summary(self, text, word_count, budget=None):
+        budget = budget or Deadline()
+        tokenizer = self.summarizer.tokenizer
+        chunk_tokens = config.SUMMARY_CHUNK_TOKENS
+        map_params = dict(
+            max_length=config.SUMMARY_PARTIAL_TOKENS,
+            min_length=min(30, config.SUMMARY_PARTIAL_TOKENS),
+            do_sample=False,
+            truncation=True
+        )
+
+        # Map: summarize paragraph-aligned chunks in batches, then summarize the
+        # joined partial summaries again until they fit in one model window
+        for _ in range(config.SUMMARY_MAX_DEPTH):
+            chunks = iter_chunks(text, tokenizer, chunk_tokens)
+            head = list(itertools.islice(chunks, 2))
+            if len(head) < 2:
+                break
+            if budget.running_low(2 * _min_inference()):
+                # No time for a map pass and the final one: summarize the opening window only
+                metrics.fallback("summary_map_deadline")
+                text = head[0]
+                break
+
+            chunks = itertools.islice(itertools.chain(head, chunks), config.SUMMARY_MAX_CHUNKS)
+            partials = []
+            for group in batched(chunks, config.BATCH_MAX_SIZE):
+                _check_preempted()
+                partials.extend(self._summarize_batch(group, map_params, budget))
+            text = "\n\n".join(partials)
+
+        # Reduce: one final pass at the requested length. Short inputs only
+        # constrain min_length instead of being padded out.
+        n_tokens = min(count_tokens(tokenizer, text), chunk_tokens)
+        params = dict(
+            max_length=word_count+50,
+            min_length=min(max(100, word_count-100), n_tokens),
+            do_sample=False,
+            truncation=True
+        )
+        _check_preempted()
+        return self._summarize_batch([text], params, budget)[0]
+
+    def _summarize_batch(self, texts, params, budget=None):
+        # BART decoding is greedy, so identical input always gives the same summary
+        keys = [memo_key("summary", text, params) for text in texts]
+        summaries = [self.summary_memo.get(key) for key in keys]
+        pending = [i for i in range(len(texts)) if summaries[i] is None]
+
+        bounded = budget is not None and budget.bounded
+        if bounded or _yield_to.get() is not None:
+            # A stopping criterion is per call, so budgeted requests bypass the shared batcher;
+            # background work runs on its own low-priority thread so it never delays a live batch
+            if pending:
+                criteria = _DeadlineCriteria(budget, _reserve()) if bounded else None
+                outputs = self._run_summary_batch(
+                    [texts[i] for i in pending],
+                    dict(params, stopping_criteria=[criteria]) if criteria else params
+                )
+                truncated = criteria is not None and criteria.triggered
+                if truncated:
+                    metrics.fallback("summary_truncated")
+                for i, output in zip(pending, outputs):
+                    summaries[i] = output['summary_text']
+                    if not truncated:
+                        self.summary_memo.put(keys[i], summaries[i])
+            return summaries
+
+        futures = {i: self.summary_batcher.submit_async(texts[i], **params) for i in pending}
+        for i, future in futures.items():
+            summaries[i] = future.result()['summary_text']
+            self.summary_memo.put(keys[i], summaries[i])
+        return summaries
+
+    def _generate_story_with_paragraphs(self, prompt, word_count, budget=None):
         try:
-            story = self.story_gen(
-                f"Write a {word_count}-word story about {prompt}:\n\n",
-                max_length=min(1024, word_count*2),
-                num_return_sequences=1,
-                temperature=0.8,
-                do_sample=True,
-                truncation=True
-            )[0]['generated_text']
-
-            paragraphs = [p.strip() for p in story.split('\n') if len(p.strip().split()) > 8]
-            return "\n\n".join(paragraphs[:8])
-        except:
+            story_prompt = self._story_prompt(prompt, word_count)
+            params = self._story_params(word_count)
+
+            # Stories are sampled; the memo is disabled (size 0) unless MEMOIZE_STORIES is set
+            key = memo_key("story", story_prompt, params)
+            story = self.story_memo.get(key)
+            if story is None and budget is not None and budget.bounded:
+                # Decode until the budget runs low instead of always running to max_length
+                criteria = _DeadlineCriteria(budget, _reserve())
+                story = self._run_story_batch(
+                    [story_prompt], dict(params, stopping_criteria=[criteria])
+                )[0]['generated_text']
+                if criteria.triggered:
+                    metrics.fallback("story_truncated")
+                    paragraphs = self._story_paragraphs(story)
+                    if not paragraphs:
+                        metrics.fallback("story_deadline")
+                        return self._fallback_story(prompt)
+                    return paragraphs
+                self.story_memo.put(key, story)
+            elif story is None:
+                story = self.story_batcher.submit(story_prompt, **params)['generated_text']
+                self.story_memo.put(key, story)
+
+            return self._story_paragraphs(story)
+        except Exception as e:
+            metrics.fallback("story_inference", e)
             return self._fallback_story(prompt)
 
+    def _story_prompt(self, prompt, word_count):
+        return f"Write a {word_count}-word story about {prompt}:\n\n"
+
+    def _story_params(self, word_count):
+        return dict(
+            max_length=min(1024, word_count*2),
+            num_return_sequences=1,
+            temperature=0.8,
+            do_sample=True,
+            truncation=True
+        )
+
+    def _story_paragraphs(self, story):
+        paragraphs = [p.strip() for p in story.split('\n') if len(p.strip().split()) > 8]
+        return "\n\n".join(paragraphs[:8])
+
     def _fallback_summary(self, topic):
         return f"{topic} is a relevant topic with many important dimensions. It has societal, economic, and historical significance."
 
     def _fallback_story(self, prompt):
         return f"Once upon a time, there was something magical about {prompt}. It inspired a tale unlike any other..."
 
-    def _fetch_web_content(self, query):
+    def _fetch_source(self, query, deadline=None):
+        for name in config.RETRIEVAL_BACKENDS:
+            fetch = self.source_backends.get(name)
+            if fetch is None:
+                continue
+            content = fetch(query, deadline)
+            if content:
+                return content
+        return None
+
+    def _fetch_local_content(self, query, deadline=None):
+        # Served from the memory-mapped index, so the deadline never comes into play
+        if self.local_index is None:
+            return None
         try:
-            search_url = f"https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch={urllib.parse.quote(query)}&format=json"
-            response = requests.get(search_url, headers=self.headers, timeout=10)
-            data = response.json()
+            with metrics.span("local_search"):
+                hits = self.local_index.search(query, 1, config.LOCAL_INDEX_MIN_MATCH)
+            metrics.cache_event("local_index", bool(hits))
+            if not hits:
+                return None
+            _, text = self.local_index.document(hits[0][0])
+            return paragraphs_from_text(text, config.SOURCE_MAX_CHARS) or None
+        except Exception as e:
+            print(f"⚠️ Local index lookup failed for {query}: {str(e)}")
+            return None
 
-            if not data.get('query', {}).get('search'):
+    def _fetch_web_content(self, query, deadline=None):
+        try:
+            page_title = self._search_title(query, deadline)
+            if not page_title:
                 return None
 
-            page_title = data['query']['search'][0]['title']
-            page_url = f"https://en.wikipedia.org/wiki/{urllib.parse.quote(page_title.replace(' ', '_'))}"
-            page_response = requests.get(page_url, headers=self.headers, timeout=10)
-            soup = BeautifulSoup(page_response.text, 'html.parser')
+            cached = self.source_cache.get_text(page_title) if self.source_cache else None
+            if cached is not None:
+                return cached or None
 
-            content = ""
-            for paragraph in soup.select('#mw-content-text p'):
-                text = paragraph.get_text().strip()
-                if text and len(text) > 50:
-                    content += text + "\n\n"
-                    if len(content) > 5000:
-                        break
+            content = None
+            if config.WIKI_EXTRACT_MODE == "extracts":
+                content = self._fetch_plaintext_extract(page_title, deadline)
+            if not content:
+                content = self._fetch_html_paragraphs(page_title, deadline)
 
+            if self.source_cache:
+                self.source_cache.put_text(page_title, content)
             return content if content else None
-        except:
+        except Exception as e:
+            print(f"⚠️ Could not fetch source text for {query}: {str(e)}")
+            return None
+
+    def _fetch_plaintext_extract(self, page_title, deadline=None):
+        # The extracts API returns the article as plain text, far smaller than the rendered page
+        try:
+            extract_url = f"{config.WIKI_BASE_URL}/w/api.php?action=query&prop=extracts&explaintext=1&redirects=1&format=json&titles={urllib.parse.quote(page_title)}"
+            response = self.http.get(extract_url, deadline)
+            _check_status(response)
+            data = response.json()
+            pages = data.get('query', {}).get('pages', {})
+            text = next(iter(pages.values()), {}).get('extract') or ""
+            return paragraphs_from_text(text, config.SOURCE_MAX_CHARS)
+        except Exception as e:
+            metrics.fallback("html_extract", e)
             return None
 
-    def _fetch_image(self, query, style=""):
+    def _fetch_html_paragraphs(self, page_title, deadline=None):
+        page_url = f"{config.WIKI_BASE_URL}/wiki/{urllib.parse.quote(page_title.replace(' ', '_'))}"
+        page_response = self.http.get(page_url, deadline, stream=True)
+        _check_status(page_response)
+        return paragraphs_from_stream(page_response, config.SOURCE_MAX_CHARS, deadline=deadline)
+
+    def _search_title(self, query, deadline=None):
+        cached = self.source_cache.get_title(query) if self.source_cache else None
+        if cached is not None:
+            return cached
+
+        search_url = f"{config.WIKI_BASE_URL}/w/api.php?action=query&list=search&srsearch={urllib.parse.quote(query)}&format=json"
+        response = self.http.get(search_url, deadline)
+        _check_status(response)
+        data = response.json()
+
+        # An error body has no 'query' at all; only a real empty result is worth caching
+        if 'search' not in data.get('query', {}):
+            print(f"⚠️ Unexpected search response for {query}: {str(data)[:200]}")
+            return ""
+        results = data['query']['search']
+        page_title = results[0]['title'] if results else ""
+        if self.source_cache:
+            self.source_cache.put_title(query, page_title)
+        return page_title
+
+    def _collect_image(self, image_future, deadline=None):
+        # Never wait on the image past the fetch deadline
+        timeout = None if deadline is None else max(0, deadline - time.monotonic())
+        try:
+            with metrics.span("image_wait"):
+                image_path = image_future.result(timeout=timeout)
+        except FutureTimeout:
+            image_future.cancel()
+            image_path = None
+        if image_path is None:
+            metrics.fallback("no_image")
+        return image_path
+
+    def _fetch_image(self, query, style="", deadline=None):
         try:
-            url = f"https://source.unsplash.com/600x400/?{urllib.parse.quote(query)},{style}"
-            response = requests.get(url, headers=self.headers, stream=True, timeout=10)
-
-            if response.status_code == 200:
-                img = Image.open(BytesIO(response.content))
-                if not os.path.exists('temp'):
-                    os.makedirs('temp')
-                img_path = f"temp/{query[:15].replace(' ', '_')}_{random.randint(1,9999)}.jpg"
-                img.save(img_path)
-                return img_path
-        except:
+            cached = self.image_store.lookup(query, style)
+            metrics.cache_event("image_store", cached is not None)
+            if cached:
+                return cached
+
+            with metrics.span("fetch_image"):
+                url = f"{config.IMAGE_BASE_URL}/600x400/?{urllib.parse.quote(query)},{style}"
+                response = self.http.get(url, deadline)
+
+                if response.status_code == 200:
+                    return self.image_store.put(query, style, response.content)
+        except Exception as e:
+            print(f"⚠️ Could not fetch image for {query}: {str(e)}")
             return None
         return None
 
     def _save_pdf(self, content):
-        filename = f"output/{content.get('title', content.get('topic', 'output'))[:20].replace(' ', '_')}.pdf"
-        os.makedirs("output", exist_ok=True)
-
-        c = canvas.Canvas(filename, pagesize=A4)
+        # Rendering happens in the background; the result only carries the artifact id
+        artifact_id = self.artifacts.submit(content)
+        content['pdf'] = f"{artifact_id}.pdf"
+        content['download_url'] = f"/download/{artifact_id}.pdf"
+
+    def _render_pdf(self, content):
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=A4)
         width, height = A4
 
         y = height - 50
@@ -192,15 +670,16 @@ class RobustContentGenerator:
 
         if content['image']:
             try:
-                img = ImageReader(content['image'])
+                img = ImageReader(self.image_store.open(content['image']))
                 c.drawImage(img, 50, y - 200, width=500, height=200, preserveAspectRatio=True)
                 y -= 220
-            except:
+            except Exception as e:
+                print(f"⚠️ Could not draw image {content['image']}: {str(e)}")
                 y -= 20
 
         c.setFont("Helvetica", 12)
 
-        wrapped_text = textwrap.wrap(content['content'], width=100)
+        wrapped_text = _wrap_text(content['content'], "Helvetica", 12, width - 100)
         for line in wrapped_text:
             if y < 50:
                 c.showPage()
@@ -210,4 +689,80 @@ class RobustContentGenerator:
             y -= 18
 
         c.save()
-        print(f"\n📄 PDF saved at: {filename}")
+        return buffer.getvalue()
+
+
+def _check_status(response):
+    # Transient errors (429, 5xx, ...) must raise rather than be cached as "no content"
+    if response.status_code != 200:
+        response.close()
+        raise IOError(f"{response.url} returned HTTP {response.status_code}")
+
+
+def _wrap_text(text, font, size, max_width):
+    """Wrap text to ``max_width`` points using the font's real glyph widths.
+
+    Paragraph breaks are kept as a blank line between paragraphs.
+    """
+    lines = []
+    for paragraph in text.split("\n\n"):
+        words = paragraph.split()
+        if not words:
+            continue
+        if lines:
+            lines.append("")
+
+        line = words[0]
+        for word in words[1:]:
+            candidate = f"{line} {word}"
+            if stringWidth(candidate, font, size) <= max_width:
+                line = candidate
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+
+def _reserve():
+    return config.DEADLINE_RESERVE_MS / 1000.0
+
+
+def _min_inference():
+    return config.DEADLINE_MIN_INFERENCE_MS / 1000.0
+
+
+def _check_preempted():
+    yield_to = _yield_to.get()
+    if yield_to is not None and yield_to():
+        raise Preempted()
+
+
+def _deadline_bucket(budget):
+    if not budget.bounded:
+        return None
+    return int(budget.expires_at * 1000 // max(1, config.DEADLINE_SHARE_BUCKET_MS))
+
+
+class _DeadlineCriteria:
+    """Stopping criterion that ends generation when ``budget`` has only ``reserve`` seconds left."""
+
+    def __init__(self, budget, reserve):
+        self.budget = budget
+        self.reserve = reserve
+        self.triggered = False
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.budget.running_low(self.reserve):
+            self.triggered = True
+        return self.triggered
+
+
+class _CancelCriteria:
+    """Stopping criterion that ends generation once ``event`` is set."""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event is not None and self.event.is_set()
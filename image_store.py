@@ -0,0 +1,132 @@
+"""Content-addressed store for downloaded images.
+
+Images are decoded and downscaled once to PDF resolution, re-encoded as
+JPEG and written to ``blobs/<sha256 of the downloaded bytes>.jpg``. A small
+``refs/`` entry maps each query+style to its blob so repeat topics skip the
+download entirely. The on-disk store is capped at ``max_bytes``
+(least-recently-used blobs are evicted) and recently used images are kept
+decoded in memory so the PDF renderer never decodes them again.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+
+class ImageStore:
+    def __init__(self, root, max_bytes=200 * 1024 * 1024, memory_items=64, max_size=(1000, 400)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.max_size = max_size
+
+        self._blobs = os.path.join(root, "blobs")
+        self._refs = os.path.join(root, "refs")
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+
+    def lookup(self, query, style=""):
+        """Return the stored image path for query+style, or None."""
+        ref = os.path.join(self._refs, _ref_key(query, style))
+        try:
+            with open(ref) as f:
+                path = self._blob_path(f.read().strip())
+        except OSError:
+            return None
+
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
+
+    def put(self, query, style, data):
+        """Downscale and store downloaded image bytes; returns the blob path."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+
+        if not os.path.exists(path):
+            img = Image.open(BytesIO(data)).convert("RGB")
+            img.thumbnail(self.max_size)
+            buffer = BytesIO()
+            img.save(buffer, format="JPEG", quality=85, optimize=True)
+
+            os.makedirs(self._blobs, exist_ok=True)
+            _atomic_write(path, buffer.getvalue())
+            self._remember(path, img)
+            self._account(buffer.tell())
+
+        os.makedirs(self._refs, exist_ok=True)
+        _atomic_write(os.path.join(self._refs, _ref_key(query, style)), digest.encode("ascii"))
+        return path
+
+    def open(self, path):
+        """Return the decoded image for ``path``, from memory when possible."""
+        with self._lock:
+            img = self._memory.get(path)
+            if img is not None:
+                self._memory.move_to_end(path)
+                return img
+
+        img = Image.open(path)
+        img.load()
+        self._remember(path, img)
+        return img
+
+    def _blob_path(self, digest):
+        return os.path.join(self._blobs, f"{digest}.jpg")
+
+    def _remember(self, path, img):
+        with self._lock:
+            self._memory[path] = img
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _account(self, size):
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._disk_bytes += size
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self._blobs):
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        # Evict down to 90% of the cap so we don't rescan on every put
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+            self._memory.pop(path, None)
+        self._disk_bytes = total
+
+
+def _ref_key(query, style):
+    normalized = " ".join(query.lower().split())
+    return hashlib.sha256(f"{normalized}|{style}".encode("utf-8")).hexdigest()
+
+
+def _atomic_write(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
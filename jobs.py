@@ -0,0 +1,156 @@
+"""Bounded job queue and inference worker pool.
+
+Generation is CPU and network bound and fully synchronous, so it runs on a
+fixed pool of worker threads instead of the uvicorn event loop. When the
+queue is full ``JobManager.submit`` raises ``QueueFull`` so the API can shed
+load with a 429. With a ``store`` the state of every pollable job is also
+written to a ``StateStore``, so ``describe`` answers for jobs queued by
+another worker process.
+"""
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.future = Future()
+        self.tracked = False
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    def __init__(self, handler, workers=4, queue_size=64, result_ttl=3600, store=None):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.result_ttl = result_ttl
+        self.store = store
+
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._jobs = {}
+        self._running = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, **params):
+        """Queue a pollable job without blocking; raises QueueFull when saturated."""
+        return self._enqueue(Job(params), track=True)
+
+    def enqueue(self, **params):
+        """Queue a job whose caller waits on ``job.future``; it is not kept for ``get``."""
+        return self._enqueue(Job(params), track=False)
+
+    def _enqueue(self, job, track):
+        self._ensure_started()
+        self._prune()
+
+        if track:
+            job.tracked = True
+            with self._lock:
+                self._jobs[job.id] = job
+            # Saved before a worker can pick it up, so a later state never gets overwritten
+            self._save(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            if track and self.store is not None:
+                self.store.delete(job.id)
+            raise QueueFull(f"Job queue is full ({self._queue.maxsize} pending)")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def describe(self, job_id):
+        """``to_dict()`` of a pollable job from this process or, failing that, the shared store."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store is not None:
+            return self.store.get(job_id)
+        return None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "running": self._running,
+            "workers": self.workers,
+            "capacity": self._queue.maxsize,
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+            job.status = "running"
+            job.started = time.time()
+            self._save(job)
+            try:
+                job.result = self.handler(**job.params)
+                if isinstance(job.result, dict) and "error" in job.result:
+                    job.status = "failed"
+                    job.error = job.result["error"]
+                else:
+                    job.status = "done"
+                job.future.set_result(job.result)
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                job.future.set_exception(e)
+            finally:
+                job.finished = time.time()
+                self._save(job)
+                with self._lock:
+                    self._running -= 1
+                self._queue.task_done()
+
+    def _save(self, job):
+        if job.tracked and self.store is not None:
+            self.store.put(job.id, job.to_dict())
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,327 @@
+"""Offline BM25 retrieval over a local corpus.
+
+``build`` ingests text files (title = file name), JSONL records with
+``title`` and ``text`` fields, or a MediaWiki XML dump (``.xml`` or
+``.xml.bz2``) into an index directory:
+
+    docs.bin      title + newline + text of every document, back to back
+    offsets.bin   uint64 start offset of each document (plus the end)
+    lengths.bin   uint32 token count of each document
+    postings.bin  uint32 (doc id, term frequency) pairs, grouped by term
+    lexicon.json  term -> [postings offset, document frequency]
+    meta.json     document count, average length and byte order
+
+Postings are collected in memory only up to ``RUN_POSTINGS`` entries, then
+written out as a sorted run and k-way merged at the end, so building needs
+roughly the lexicon plus 12 bytes per document of memory regardless of
+corpus size. ``LocalIndex`` memory-maps the documents and postings, so a
+lookup reads only the postings of the query terms and the one document it
+returns.
+
+    python local_index.py build corpus/ enwiki-latest-pages-articles.xml.bz2 --output cache/index
+    python local_index.py search "black holes" --index cache/index
+"""
+import argparse
+import bz2
+import heapq
+import itertools
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import config
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+# Title terms count this many times, so the article about a topic outranks passing mentions
+TITLE_WEIGHT = 3
+
+# Postings held in memory before they are spilled to a sorted run on disk
+RUN_POSTINGS = 5000000
+
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LocalIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            meta = json.load(f)
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was built on a {meta['byteorder']}-endian machine")
+        self.count = meta["count"]
+        self.avg_length = meta["avg_length"]
+
+        with open(self.path / "lexicon.json") as f:
+            self.lexicon = json.load(f)
+        self.offsets = _read_array("Q", self.path / "offsets.bin")
+        self.lengths = _read_array("I", self.path / "lengths.bin")
+
+        self._files = []
+        self.docs = self._mmap("docs.bin")
+        self.postings = self._mmap("postings.bin")
+
+    def _mmap(self, name):
+        f = open(self.path / name, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        for mapped in (self.docs, self.postings):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for f in self._files:
+            f.close()
+
+    def search(self, query, k=5, min_match=0.0):
+        """Top ``k`` (doc id, score) pairs by BM25.
+
+        Documents containing fewer than ``min_match`` of the query terms are
+        left out.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        scores = defaultdict(float)
+        matched = Counter()
+        for term in terms:
+            entry = self.lexicon.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            postings = array("I")
+            postings.frombytes(self.postings[offset:offset + df * 8])
+            for i in range(0, len(postings), 2):
+                doc, tf = postings[i], postings[i + 1]
+                norm = K1 * (1 - B + B * self.lengths[doc] / self.avg_length)
+                scores[doc] += idf * tf * (K1 + 1) / (tf + norm)
+                matched[doc] += 1
+
+        needed = min_match * len(terms)
+        ranked = sorted(
+            ((doc, score) for doc, score in scores.items() if matched[doc] >= needed),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        return ranked[:k]
+
+    def document(self, doc):
+        """(title, text) of document ``doc``, read from the memory-mapped store."""
+        raw = self.docs[self.offsets[doc]:self.offsets[doc + 1]].decode("utf-8")
+        title, _, text = raw.partition("\n")
+        return title, text
+
+
+def _read_array(typecode, path):
+    values = array(typecode)
+    with open(path, "rb") as f:
+        values.frombytes(f.read())
+    return values
+
+
+def build(inputs, output, run_postings=RUN_POSTINGS):
+    """Index every document under ``inputs`` into the directory ``output``."""
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    offsets = array("Q", [0])
+    lengths = array("I")
+
+    with tempfile.TemporaryDirectory(dir=output) as scratch:
+        runs = []
+        postings = defaultdict(lambda: array("I"))
+        held = 0
+        with open(output / "docs.bin", "wb") as docs:
+            for title, text in iter_documents(inputs):
+                text = text.strip()
+                if not text:
+                    continue
+                doc = len(lengths)
+                tokens = tokenize(title) * TITLE_WEIGHT + tokenize(text)
+                counts = Counter(tokens)
+                for term, tf in counts.items():
+                    postings[term].extend((doc, tf))
+                held += len(counts)
+                lengths.append(len(tokens))
+
+                docs.write(f"{title}\n{text}".encode("utf-8"))
+                offsets.append(docs.tell())
+
+                if held >= run_postings:
+                    runs.append(_write_run(postings, Path(scratch) / f"run-{len(runs)}"))
+                    postings.clear()
+                    held = 0
+        if postings:
+            runs.append(_write_run(postings, Path(scratch) / f"run-{len(runs)}"))
+            postings.clear()
+
+        lexicon = {}
+        with open(output / "postings.bin", "wb") as f:
+            # Runs cover ascending doc ids, so concatenating them in run order keeps each list sorted
+            merged = heapq.merge(*(_read_run(path, i) for i, path in enumerate(runs)))
+            for term, entries in itertools.groupby(merged, key=lambda entry: entry[0]):
+                start, count = f.tell(), 0
+                for _, _, packed in entries:
+                    packed.tofile(f)
+                    count += len(packed) // 2
+                lexicon[term] = [start, count]
+
+    with open(output / "offsets.bin", "wb") as f:
+        offsets.tofile(f)
+    with open(output / "lengths.bin", "wb") as f:
+        lengths.tofile(f)
+    with open(output / "lexicon.json", "w") as f:
+        json.dump(lexicon, f, separators=(",", ":"))
+
+    count = len(lengths)
+    meta = {
+        "count": count,
+        "avg_length": (sum(lengths) / count) if count else 0.0,
+        "terms": len(lexicon),
+        "byteorder": sys.byteorder,
+    }
+    with open(output / "meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _write_run(postings, path):
+    # One "term<TAB>doc tf doc tf ..." line per term, sorted by term
+    with open(path, "w", encoding="utf-8") as f:
+        for term in sorted(postings):
+            f.write(f"{term}\t{' '.join(map(str, postings[term]))}\n")
+    return path
+
+
+def _read_run(path, run):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            term, _, values = line.rstrip("\n").partition("\t")
+            yield term, run, array("I", map(int, values.split()))
+
+
+def iter_documents(inputs):
+    for root in inputs:
+        root = Path(root)
+        paths = sorted(p for p in root.rglob("*") if p.is_file()) if root.is_dir() else [root]
+        for path in paths:
+            name = path.name.lower()
+            if name.endswith((".xml", ".xml.bz2")):
+                yield from _wiki_dump_documents(path)
+            elif name.endswith((".jsonl", ".ndjson")):
+                yield from _jsonl_documents(path)
+            elif name.endswith((".txt", ".md")):
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    yield path.stem.replace("_", " "), f.read()
+
+
+def _jsonl_documents(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                print(f"⚠️ Skipping malformed line in {path}")
+                continue
+            if record.get("text"):
+                yield str(record.get("title", "")), record["text"]
+
+
+def _wiki_dump_documents(path):
+    opener = bz2.open if path.name.lower().endswith(".bz2") else open
+    with opener(path, "rb") as f:
+        root = None
+        for event, element in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = element
+            if event != "end" or _local_name(element.tag) != "page":
+                continue
+            fields = {_local_name(child.tag): child.text or "" for child in element.iter()}
+            title, text = fields.get("title", ""), fields.get("text", "")
+            # Only main namespace articles (ns 0), no redirects
+            if title and fields.get("ns") == "0" and not text.lstrip().upper().startswith("#REDIRECT"):
+                yield title, strip_wikitext(text)
+            # Drop finished pages from the tree so memory stays flat over the whole dump
+            root.clear()
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+_TEMPLATE_RE = re.compile(r"\{\{[^{}]*\}\}")
+_TABLE_RE = re.compile(r"\{\|.*?\|\}", re.S)
+_REF_RE = re.compile(r"<ref[^>]*/>|<ref[^>]*>.*?</ref>", re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+_FILE_LINK_RE = re.compile(r"\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]", re.I)
+_LINK_RE = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]")
+_EXTERNAL_LINK_RE = re.compile(r"\[https?://\S+\s*([^\]]*)\]")
+_HEADING_RE = re.compile(r"^=+\s*(.*?)\s*=+\s*$", re.M)
+
+
+def strip_wikitext(text):
+    """Rough wikitext to plain text: enough for ranking and summarization."""
+    previous = None
+    while previous != text:
+        previous, text = text, _TEMPLATE_RE.sub("", text)
+    text = _TABLE_RE.sub("", text)
+    text = _REF_RE.sub("", text)
+    text = _FILE_LINK_RE.sub("", text)
+    text = _LINK_RE.sub(r"\1", text)
+    text = _EXTERNAL_LINK_RE.sub(r"\1", text)
+    text = _TAG_RE.sub("", text)
+    text = _HEADING_RE.sub("", text)
+    return text.replace("'''", "").replace("''", "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the local BM25 source index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="index text files, JSONL records or a MediaWiki XML dump")
+    build_parser.add_argument("inputs", nargs="+", help="files or directories to ingest")
+    build_parser.add_argument("--output", default=config.LOCAL_INDEX_PATH or "cache/index")
+
+    search_parser = commands.add_parser("search", help="show the top documents for a query")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--index", default=config.LOCAL_INDEX_PATH or "cache/index")
+    search_parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        meta = build(args.inputs, args.output)
+        print(f"✅ Indexed {meta['count']} documents ({meta['terms']} terms) into {args.output}")
+        return
+
+    index = LocalIndex(args.index)
+    for doc, score in index.search(args.query, args.k):
+        title, text = index.document(doc)
+        print(f"{score:8.3f}  {title}: {text[:100]!r}")
+
+
+if __name__ == "__main__":
+    main()
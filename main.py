@@ -1,14 +1,26 @@
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form, File, UploadFile
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from pathlib import Path
 from typing import Optional
+import asyncio
+import json
 import os
+import shutil
+import threading
 import time
+import uuid
 
+import config
+import metrics
 from app.schemas import ContentRequest
 from generator import RobustContentGenerator
+from jobs import JobManager, QueueFull
+from batch import BatchRun
+from state_store import StateStore
+from prewarm import Prewarmer, RequestLog, TopicTracker
 
 app = FastAPI(title="Robust Content Generator API", version="1.0.0")
 
@@ -18,9 +30,111 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Setup templates
 templates = Jinja2Templates(directory="app/templates")
 
-# Initialize generator
+# Initialize generator (models load lazily; see the startup warm-up below)
 generator = RobustContentGenerator()
 
+# Job and batch state every serve.py worker can read, so a poll may land on any of them
+job_state = batch_state = None
+if config.STATE_STORE_PATH:
+    job_state = StateStore(config.STATE_STORE_PATH, "jobs", config.JOB_RESULT_TTL)
+    batch_state = StateStore(config.STATE_STORE_PATH, "batches", config.BATCH_STATE_TTL)
+
+# Generation runs on a bounded worker pool so the event loop stays responsive
+jobs = JobManager(
+    generator.generate_content,
+    workers=config.JOB_WORKERS,
+    queue_size=config.JOB_QUEUE_SIZE,
+    result_ttl=config.JOB_RESULT_TTL,
+    store=job_state,
+)
+
+# Popular topics are pre-generated in idle time when PREWARM_ENABLED is set
+prewarmer = None
+if config.PREWARM_ENABLED:
+    prewarmer = Prewarmer(
+        generator,
+        TopicTracker(config.PREWARM_HALF_LIFE),
+        RequestLog(config.REQUEST_LOG_PATH, config.REQUEST_LOG_MAX_MB * 1024 * 1024)
+        if config.REQUEST_LOG_PATH else None,
+        is_busy=lambda: any(jobs.stats()[state] for state in ("queued", "running")),
+        interval=config.PREWARM_INTERVAL,
+        top_n=config.PREWARM_TOP_N,
+        max_load=config.PREWARM_MAX_LOAD,
+        nice=config.PREWARM_NICE,
+    )
+
+# Bulk JSONL runs started through /batch
+batch_runs = {}
+
+# Streams decode outside the job pool, so they get their own concurrency cap
+stream_slots = threading.BoundedSemaphore(config.STREAM_MAX_CONCURRENT)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _observe_request(endpoint, content_type, status, start_time):
+    metrics.REQUEST_SECONDS.observe(
+        time.time() - start_time, endpoint=endpoint, content_type=content_type, status=status
+    )
+
+def _record_request(prompt, content_type):
+    if prewarmer is not None:
+        prewarmer.record_request(prompt, content_type)
+
+def _batch_state(batch_id):
+    run = batch_runs.get(batch_id)
+    if run is not None:
+        return run.to_dict()
+    if batch_state is not None:
+        return batch_state.get(batch_id)
+    return None
+
+def _release_once(semaphore):
+    """A release callback that is safe to call from every exit path."""
+    lock = threading.Lock()
+    released = []
+
+    def release():
+        with lock:
+            if released:
+                return
+            released.append(True)
+        semaphore.release()
+    return release
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs ``on_close`` however the response ends.
+
+    The body generator's own ``finally`` never runs if the client is gone
+    before Starlette starts iterating it.
+    """
+
+    def __init__(self, *args, on_close=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+def _busy_response():
+    return JSONResponse(
+        {"error": "Server is busy, please retry shortly"},
+        status_code=429,
+        headers={"Retry-After": "5"}
+    )
+
+@app.on_event("startup")
+async def warm_up_models():
+    """Load the configured models in the background so startup is not blocked"""
+    generator.start_warm_up(config.PRELOAD_MODELS)
+    # serve.py numbers its workers; warming in all of them would repeat the same inference N times
+    if prewarmer is not None and os.getenv("SERVE_WORKER_INDEX", "0") == "0":
+        prewarmer.start()
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Render the main UI page"""
@@ -31,14 +145,31 @@ async def generate_content(
     request: Request,
     prompt: str = Form(...),
     content_type: str = Form("summary"),
+    deadline_ms: Optional[int] = Form(None),
 ):
-    """Generate content based on user input"""
+    """Generate content based on user input, optionally within a latency budget"""
     start_time = time.time()
-    
+    if deadline_ms is not None and deadline_ms <= 0:
+        return JSONResponse(
+            {"error": "deadline_ms must be positive"},
+            status_code=400
+        )
+
+    _record_request(prompt, content_type)
+
+    # The budget starts now, so time spent queued counts against it
+    deadline = time.monotonic() + deadline_ms / 1000.0 if deadline_ms else None
     try:
-        result = generator.generate_content(prompt, content_type)
+        job = jobs.enqueue(prompt=prompt, content_type=content_type, deadline=deadline)
+    except QueueFull:
+        _observe_request("generate", content_type, 429, start_time)
+        return _busy_response()
+
+    try:
+        result = await asyncio.wrap_future(job.future)
         
         if "error" in result:
+            _observe_request("generate", content_type, 400, start_time)
             return JSONResponse(
                 {"error": result["error"]},
                 status_code=400
@@ -46,25 +177,256 @@ async def generate_content(
             
         processing_time = round(time.time() - start_time, 2)
         result["processing_time"] = processing_time
+
+        timings = {"queue": round((job.started - job.created) * 1000, 2)}
+        timings.update(result.get("timings", {}))
+        timings["total"] = round(processing_time * 1000, 2)
+        _observe_request("generate", content_type, 200, start_time)
         
-        return JSONResponse(result)
+        return JSONResponse(result, headers={"Server-Timing": metrics.server_timing(timings)})
         
     except Exception as e:
+        _observe_request("generate", content_type, 500, start_time)
         return JSONResponse(
             {"error": f"Generation failed: {str(e)}"},
             status_code=500
         )
 
+@app.post("/generate/stream")
+async def generate_stream(
+    request: Request,
+    prompt: str = Form(...),
+    content_type: str = Form("story"),
+):
+    """Stream a story token by token as server-sent events"""
+    release_slot = None
+    if content_type == "story":
+        if not stream_slots.acquire(blocking=False):
+            return _busy_response()
+        release_slot = _release_once(stream_slots)
+    else:
+        # Summaries are not decoded incrementally; queue them and send one result event
+        try:
+            job = jobs.enqueue(prompt=prompt, content_type=content_type)
+        except QueueFull:
+            return _busy_response()
+
+    async def events():
+        start_time = time.time()
+        if content_type != "story":
+            result = await asyncio.wrap_future(job.future)
+            result["processing_time"] = round(time.time() - start_time, 2)
+            yield _sse("error" if "error" in result else "result", result)
+            return
+
+        cancel = threading.Event()
+        try:
+            async for event, data in iterate_in_threadpool(generator.stream_story(prompt, cancel)):
+                if await request.is_disconnected():
+                    break
+                if event == "result":
+                    data["processing_time"] = round(time.time() - start_time, 2)
+                yield _sse(event, data)
+        except Exception as e:
+            yield _sse("error", {"error": f"Generation failed: {str(e)}"})
+        finally:
+            # Stop decoding if the client went away so the worker is freed
+            cancel.set()
+            release_slot()
+
+    return _ClosingStreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        on_close=release_slot
+    )
+
+@app.post("/jobs", response_class=JSONResponse)
+async def create_job(
+    prompt: str = Form(...),
+    content_type: str = Form("summary"),
+):
+    """Queue a generation job and return its id"""
+    _record_request(prompt, content_type)
+    try:
+        job = jobs.submit(prompt=prompt, content_type=content_type)
+    except QueueFull:
+        return _busy_response()
+
+    return JSONResponse(
+        {"job_id": job.id, "status": job.status},
+        status_code=202
+    )
+
+@app.get("/jobs/{job_id}", response_class=JSONResponse)
+async def get_job(job_id: str):
+    """Report the status (and result, once finished) of a job"""
+    job = jobs.describe(job_id)
+    if job is None:
+        return JSONResponse(
+            {"error": "Job not found"},
+            status_code=404
+        )
+    return JSONResponse(job)
+
+@app.post("/batch", response_class=JSONResponse)
+async def create_batch(
+    file: UploadFile = File(...),
+    processes: int = Form(config.BATCH_JOB_PROCESSES),
+):
+    """Start a bulk run over an uploaded JSONL file of {prompt, content_type} records"""
+    batch_id = uuid.uuid4().hex
+    directory = Path(config.BATCH_JOB_DIR) / batch_id
+    directory.mkdir(parents=True, exist_ok=True)
+    input_path = directory / "input.jsonl"
+    with open(input_path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+
+    # Every process loads both models, so never fork more than the box can hold
+    processes = max(1, min(processes, os.cpu_count() or 1, config.BATCH_MAX_PROCESSES))
+    run = BatchRun(batch_id, str(input_path), str(directory / "manifest.jsonl"), processes, store=batch_state)
+    batch_runs[batch_id] = run
+    return JSONResponse(run.to_dict(), status_code=202)
+
+@app.get("/batch/{batch_id}", response_class=JSONResponse)
+async def get_batch(batch_id: str):
+    """Report progress of a bulk run"""
+    state = _batch_state(batch_id)
+    if state is None:
+        return JSONResponse(
+            {"error": "Batch not found"},
+            status_code=404
+        )
+    return JSONResponse(state)
+
+@app.get("/batch/{batch_id}/manifest")
+async def get_batch_manifest(batch_id: str):
+    """Stream the results manifest written so far"""
+    # Only ids /batch handed out are known, so the path below cannot escape BATCH_JOB_DIR
+    path = Path(config.BATCH_JOB_DIR) / batch_id / "manifest.jsonl"
+    if _batch_state(batch_id) is None or not path.exists():
+        return JSONResponse(
+            {"error": "Manifest not found"},
+            status_code=404
+        )
+    size = os.path.getsize(path)
+    return StreamingResponse(_file_chunks(str(path), 0, size - 1), media_type="application/x-ndjson")
+
+@app.get("/healthz", response_class=JSONResponse)
+async def healthz():
+    """Liveness probe: the process is up and serving"""
+    return JSONResponse({"status": "ok", "models": generator.model_status()})
+
+@app.get("/readyz", response_class=JSONResponse)
+async def readyz():
+    """Readiness probe: every preloaded model has finished its first load"""
+    models = generator.model_status()
+    # Reloads after an eviction happen on demand and do not make the worker unready
+    pending = [
+        name for name in config.PRELOAD_MODELS
+        if models.get(name, {}).get("state") in ("not_loaded", "loading") and not models[name]["loads"]
+    ]
+    return JSONResponse(
+        {"ready": not pending, "pending": pending, "models": models, "residency": generator.models.stats()},
+        status_code=503 if pending else 200
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus metrics: stage latency histograms, cache, fallback and failure counters"""
+    stats = jobs.stats()
+    metrics.JOBS.set(stats["queued"], state="queued")
+    metrics.JOBS.set(stats["running"], state="running")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats", response_class=JSONResponse)
+async def stats():
+    """Report queue depth, cache hit/miss counters, model residency and pre-generation"""
+    return JSONResponse({
+        "jobs": jobs.stats(),
+        "cache": generator.cache_stats(),
+        "models": generator.models.stats(),
+        "prewarm": prewarmer.stats() if prewarmer is not None else None,
+    })
+
+def _parse_range(header, size):
+    """Parse a single ``bytes=start-end`` range; None if it cannot be satisfied."""
+    start, _, end = header.replace("bytes=", "", 1).strip().partition("-")
+    try:
+        if start:
+            first, last = int(start), int(end) if end else size - 1
+        else:
+            first, last = max(0, size - int(end)), size - 1
+    except ValueError:
+        return None
+    if first > last or first >= size:
+        return None
+    return first, min(last, size - 1)
+
+def _file_chunks(path, start, end, chunk_size=64 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
 @app.get("/download/{filename}")
-async def download_pdf(filename: str):
-    """Download generated PDF"""
-    file_path = Path("output") / filename
-    if not file_path.exists():
+async def download_pdf(request: Request, filename: str):
+    """Download a generated PDF, with ETag and Range support"""
+    artifact_id = filename[:-4] if filename.endswith(".pdf") else filename
+    artifact = generator.artifacts.get(artifact_id)
+    if artifact is None:
         return JSONResponse(
             {"error": "File not found"},
             status_code=404
         )
-    return FileResponse(file_path, filename=filename)
+
+    if not artifact.wait(0):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, artifact.wait, config.PDF_DOWNLOAD_WAIT)
+    if artifact.status == "pending":
+        return JSONResponse(
+            {"status": "pending"},
+            status_code=202,
+            headers={"Retry-After": "2"}
+        )
+    if artifact.status == "failed":
+        return JSONResponse(
+            {"error": f"PDF rendering failed: {artifact.error}"},
+            status_code=500
+        )
+
+    headers = {
+        "ETag": artifact.etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{artifact.name}.pdf"',
+    }
+    if request.headers.get("if-none-match") == artifact.etag:
+        return Response(status_code=304, headers=headers)
+
+    status_code, start, end = 200, 0, artifact.size - 1
+    range_header = request.headers.get("range")
+    if range_header and "," not in range_header:
+        byte_range = _parse_range(range_header, artifact.size)
+        if byte_range is None:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{artifact.size}"})
+        status_code, (start, end) = 206, byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{artifact.size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    data = generator.artifacts.read(artifact)
+    if data is not None:
+        return Response(data[start:end + 1], status_code=status_code, media_type="application/pdf", headers=headers)
+    return StreamingResponse(
+        _file_chunks(artifact.path, start, end),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,201 @@
+"""Per-stage timing spans and Prometheus metrics.
+
+``span("stage")`` times a block, records it in the ``stage_seconds``
+histogram and, when called under ``request_timings()``, in the per-request
+timings used for the ``Server-Timing`` header. ``request_fallbacks()``
+likewise collects the fallbacks a request took, reported as ``degraded``. ``REGISTRY.render()``
+produces the Prometheus text exposition format served at ``/metrics``.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_timings = contextvars.ContextVar("timings", default=None)
+_fallbacks = contextvars.ContextVar("fallbacks", default=None)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{self._labels(key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, key, value):
+        counts, total, count = value
+        lines = [
+            f"{self.name}_bucket{self._labels(key, {'le': _format(bound)})} {n}"
+            for bound, n in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_bucket{self._labels(key, {'le': '+Inf'})} {count}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "content_generator_stage_seconds", "Time spent in each generation stage", ["stage"]
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "content_generator_request_seconds", "End-to-end API request latency", ["endpoint", "content_type", "status"]
+))
+CACHE_EVENTS = REGISTRY.register(Counter(
+    "content_generator_cache_events_total", "Cache lookups by cache and result", ["cache", "result"]
+))
+FALLBACKS = REGISTRY.register(Counter(
+    "content_generator_fallbacks_total", "Fallback activations by kind", ["kind"]
+))
+MODEL_LOAD_FAILURES = REGISTRY.register(Counter(
+    "content_generator_model_load_failures_total", "Models that failed to load", ["model", "backend"]
+))
+MODEL_EVICTIONS = REGISTRY.register(Counter(
+    "content_generator_model_evictions_total", "Models evicted by the residency manager", ["model", "reason"]
+))
+MODEL_RESIDENT_BYTES = REGISTRY.register(Gauge(
+    "content_generator_model_resident_bytes", "Estimated memory held by each loaded model", ["model"]
+))
+JOBS = REGISTRY.register(Gauge(
+    "content_generator_jobs", "Jobs in the generation queue by state", ["state"]
+))
+
+
+@contextmanager
+def span(stage):
+    """Time a block as ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed * 1000, 2)
+
+
+@contextmanager
+def request_timings():
+    """Collect the spans of the current request into a dict of stage -> ms."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def request_fallbacks():
+    """Collect the fallback kinds taken by the current request, in order."""
+    kinds = []
+    token = _fallbacks.set(kinds)
+    try:
+        yield kinds
+    finally:
+        _fallbacks.reset(token)
+
+
+def cache_event(cache, hit):
+    CACHE_EVENTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def fallback(kind, error=None):
+    FALLBACKS.inc(kind=kind)
+    kinds = _fallbacks.get()
+    if kinds is not None and kind not in kinds:
+        kinds.append(kind)
+    if error is not None:
+        print(f"⚠️ Using {kind} fallback: {str(error)}")
+
+
+def server_timing(timings):
+    return ", ".join(f"{stage};dur={ms}" for stage, ms in timings.items())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value):
+    return repr(float(value))
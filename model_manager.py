@@ -0,0 +1,271 @@
+"""Load, keep and evict model pipelines under a memory budget.
+
+``ModelManager`` owns every pipeline instance. Models load on first use,
+and every use marks them as recently used. When loading one would go over
+``budget_bytes``, the least-recently-used unpinned models are evicted
+first. Before a model's first load its size comes from ``estimates`` or,
+failing that, from the weight files in the Hugging Face cache. A
+background reaper also evicts unpinned models that have been idle for
+``idle_timeout`` seconds. Evicting only drops the manager's reference, so a
+request that is still using the pipeline finishes normally.
+
+Under the pre-fork server the models loaded before the fork are pinned:
+their pages are shared with the parent, so evicting them in a worker would
+free nothing and the reload would be a private copy. The parent also
+defers the reaper until after the fork; each worker starts its own on its
+first load.
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import threading
+import time
+
+import metrics
+
+_MISSING = object()
+
+
+class ModelManager:
+    def __init__(self, specs, loader, budget_bytes=0, idle_timeout=0, pinned=(), estimates=None):
+        # specs: name -> (task, model id, backend); loader(task, model_id, backend) -> pipeline or None
+        self.specs = specs
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.idle_timeout = idle_timeout
+        self.pinned = set(pinned)
+        self.estimates = dict(estimates or {})
+        # A pre-fork server sets this until it has forked, so no reaper thread is copied into the workers
+        self.defer_reaper = False
+
+        self._models = {}
+        self._status = {
+            name: {
+                "state": "not_loaded",
+                "model": model_name,
+                "backend": backend,
+                "pinned": name in self.pinned,
+                "load_seconds": None,
+                "bytes": None,
+                "loads": 0,
+                "evictions": 0,
+                "last_used": None,
+            }
+            for name, (_, model_name, backend) in specs.items()
+        }
+        self._load_locks = {name: threading.Lock() for name in specs}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def get(self, name):
+        """The pipeline for ``name``, loading it first if needed (None if it failed to load)."""
+        status = self._status[name]
+        pipe = self._models.get(name, _MISSING)
+        if pipe is not _MISSING:
+            status["last_used"] = time.time()
+            return pipe
+
+        with self._load_locks[name]:
+            pipe = self._models.get(name, _MISSING)
+            if pipe is _MISSING:
+                return self._load(name)
+            status["last_used"] = time.time()
+            return pipe
+
+    def loaded(self):
+        return [pipe for pipe in self._models.values() if pipe is not None]
+
+    def status(self):
+        now = time.time()
+        report = {}
+        for name, status in self._status.items():
+            entry = dict(status)
+            entry["idle_seconds"] = round(now - status["last_used"], 1) if status["last_used"] else None
+            del entry["last_used"]
+            report[name] = entry
+        return report
+
+    def stats(self):
+        return {
+            "budget_bytes": self.budget_bytes,
+            "resident_bytes": self._resident_bytes(),
+            "resident": [name for name, pipe in self._models.items() if pipe is not None],
+            "idle_timeout": self.idle_timeout,
+        }
+
+    def pin_loaded(self):
+        """Never evict the models that are loaded now."""
+        with self._lock:
+            for name, pipe in self._models.items():
+                if pipe is not None:
+                    self.pinned.add(name)
+                    self._status[name]["pinned"] = True
+
+    def evict(self, name, reason="manual"):
+        with self._lock:
+            if self._models.get(name) is None:
+                return False
+            pipe = self._models.pop(name)
+            status = self._status[name]
+            status["state"] = "evicted"
+            status["evictions"] += 1
+        metrics.MODEL_EVICTIONS.inc(model=name, reason=reason)
+        metrics.MODEL_RESIDENT_BYTES.set(0, model=name)
+        print(f"♻️ Evicted {name} model ({reason})")
+        del pipe
+        _release_memory()
+        return True
+
+    def _load(self, name):
+        task, model_name, backend = self.specs[name]
+        status = self._status[name]
+        # A model loaded before tells us how much room it needs; otherwise estimate it
+        self._make_room(status["bytes"] or self._estimate(name), exclude=name)
+
+        status["state"] = "loading"
+        start = time.time()
+        rss_before = _rss_bytes()
+        pipe = self.loader(task, model_name, backend)
+        status["load_seconds"] = round(time.time() - start, 2)
+
+        if pipe is None:
+            status["state"] = "failed"
+            self._models[name] = None
+            return None
+
+        size = _pipeline_bytes(pipe)
+        if size is None:
+            size = max(0, _rss_bytes() - rss_before)
+        with self._lock:
+            status["bytes"] = size
+            status["loads"] += 1
+            status["state"] = "loaded"
+            status["last_used"] = time.time()
+            self._models[name] = pipe
+        metrics.MODEL_RESIDENT_BYTES.set(size, model=name)
+
+        self._make_room(0, exclude=name)
+        self._ensure_reaper()
+        return pipe
+
+    def _estimate(self, name):
+        if name in self.estimates:
+            return self.estimates[name]
+        return _weights_on_disk(self.specs[name][1]) or 0
+
+    def _make_room(self, needed, exclude):
+        if not self.budget_bytes:
+            return
+        while self._resident_bytes() + needed > self.budget_bytes:
+            victim = self._lru_victim(exclude)
+            if victim is None:
+                print(f"⚠️ Model memory budget of {self.budget_bytes // (1024 * 1024)} MB exceeded by pinned models")
+                return
+            self.evict(victim, "budget")
+
+    def _lru_victim(self, exclude):
+        with self._lock:
+            candidates = [
+                name for name, pipe in self._models.items()
+                if pipe is not None and name != exclude and name not in self.pinned
+            ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda name: self._status[name]["last_used"] or 0)
+
+    def _resident_bytes(self):
+        with self._lock:
+            return sum(self._status[name]["bytes"] or 0 for name, pipe in self._models.items() if pipe is not None)
+
+    def _ensure_reaper(self):
+        # Started on a load rather than in __init__; see defer_reaper
+        if self.defer_reaper or not self.idle_timeout or (self._reaper is not None and self._reaper.is_alive()):
+            return
+        self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        interval = max(1.0, min(self.idle_timeout / 2, 30.0))
+        while True:
+            time.sleep(interval)
+            cutoff = time.time() - self.idle_timeout
+            with self._lock:
+                idle = [
+                    name for name, pipe in self._models.items()
+                    if pipe is not None and name not in self.pinned
+                    and (self._status[name]["last_used"] or 0) < cutoff
+                ]
+            for name in idle:
+                self.evict(name, "idle")
+
+
+def _pipeline_bytes(pipe):
+    """Size of the weights and buffers of a PyTorch pipeline; None for other backends."""
+    model = getattr(pipe, "model", None)
+    if not hasattr(model, "parameters"):
+        return None
+    # Dynamically quantized layers keep their weights in packed params, which are
+    # neither parameters nor buffers; the RSS growth is the better measure there
+    if any(hasattr(module, "_packed_params") for module in model.modules()):
+        return None
+    tensors = list(model.parameters())
+    if hasattr(model, "buffers"):
+        tensors.extend(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def _weights_on_disk(model_id):
+    """Size of one format's weight files for a local model directory or a Hugging Face cache entry."""
+    if os.path.isdir(model_id):
+        roots = [model_id]
+    else:
+        cache = os.getenv("HF_HUB_CACHE") or os.path.join(
+            os.getenv("HF_HOME", os.path.expanduser("~/.cache/huggingface")), "hub"
+        )
+        snapshots = os.path.join(cache, "models--" + model_id.replace("/", "--"), "snapshots")
+        try:
+            roots = [os.path.join(snapshots, name) for name in os.listdir(snapshots)]
+        except OSError:
+            return None
+
+    best = 0
+    for root in roots:
+        sizes = {}
+        for directory, _, files in os.walk(root):
+            for file in files:
+                ext = os.path.splitext(file)[1]
+                if ext in (".safetensors", ".bin", ".onnx"):
+                    try:
+                        sizes[ext] = sizes.get(ext, 0) + os.path.getsize(os.path.join(directory, file))
+                    except OSError:
+                        pass
+        # Repos often ship the same weights in several formats; only one gets loaded
+        for ext in (".safetensors", ".bin", ".onnx"):
+            if sizes.get(ext):
+                best = max(best, sizes[ext])
+                break
+    return best or None
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+_libc = None
+
+
+def _release_memory():
+    # Collect the dropped pipeline and hand freed heap pages back to the OS (glibc only)
+    global _libc
+    gc.collect()
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        _libc.malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
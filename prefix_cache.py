@@ -0,0 +1,84 @@
+"""Reuse the key/value states of a fixed prompt prefix across GPT-2 calls.
+
+Story prompts start with the same instruction template, so attention over
+those tokens is identical on every request. ``PrefixCache`` runs the prefix
+through the model once per (model, prefix), keeps the resulting
+``past_key_values`` and starts each generation from them, so only the
+per-request suffix is prefilled. States are held weakly on the model and
+are dropped with it.
+"""
+import threading
+import weakref
+from collections import OrderedDict
+
+
+class PrefixCache:
+    def __init__(self, max_prefixes=16):
+        self.max_prefixes = max_prefixes
+        self._states = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def generate(self, pipe, prefix, suffix, **params):
+        """Generate from ``prefix + suffix``; returns the text like a pipeline's ``generated_text``."""
+        import torch
+
+        tokenizer, model = pipe.tokenizer, pipe.model
+        prompt = prefix + suffix
+        prefix_ids, past, cache_type = self._prefix_state(model, tokenizer, prefix)
+        input_ids = tokenizer(prompt, return_tensors="pt").input_ids.to(model.device)
+
+        n_prefix = prefix_ids.shape[1]
+        if input_ids.shape[1] <= n_prefix or not torch.equal(input_ids[:, :n_prefix], prefix_ids):
+            # The prefix does not tokenize the same inside the full prompt; do the whole prefill
+            past = None
+        else:
+            past = cache_type.from_legacy_cache(past) if cache_type else past
+            if input_ids.shape[1] - n_prefix > 1:
+                # Prefill all but the last suffix token so generate() only feeds that one
+                with torch.no_grad():
+                    past = model(input_ids[:, n_prefix:-1], past_key_values=past, use_cache=True).past_key_values
+
+        params.pop("truncation", None)
+        params.setdefault("pad_token_id", tokenizer.eos_token_id)
+        with torch.no_grad():
+            output = model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past,
+                **params
+            )
+
+        # Same shape as the text-generation pipeline: the prompt plus the decoded continuation
+        decoded_prompt = tokenizer.decode(input_ids[0], skip_special_tokens=True)
+        text = tokenizer.decode(output[0], skip_special_tokens=True)
+        return prompt + text[len(decoded_prompt):]
+
+    def _prefix_state(self, model, tokenizer, prefix):
+        import torch
+
+        with self._lock:
+            states = self._states.setdefault(model, OrderedDict())
+            state = states.get(prefix)
+            if state is not None:
+                states.move_to_end(prefix)
+                self.hits += 1
+                return state
+
+            self.misses += 1
+            prefix_ids = tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+            with torch.no_grad():
+                past = model(prefix_ids, use_cache=True).past_key_values
+
+            # Keep immutable tuples; newer transformers return a Cache object that
+            # generate() extends in place, so each call gets a fresh one from the tuples
+            cache_type = None
+            if hasattr(past, "to_legacy_cache"):
+                cache_type = type(past)
+                past = past.to_legacy_cache()
+
+            state = states[prefix] = (prefix_ids, past, cache_type)
+            while len(states) > self.max_prefixes:
+                states.popitem(last=False)
+            return state
@@ -0,0 +1,323 @@
+"""Pre-generate popular topics while the server is idle.
+
+``TopicTracker`` ranks topics by an exponentially decayed request count, so
+it balances frequency against recency. Every worker appends its requests to
+the JSONL request log (rotated to ``.1`` once it reaches ``max_bytes``), and
+the tracker is fed by tailing that log, so under ``serve.py`` the ranking
+covers all workers' traffic. Without a log it counts this process's
+requests directly.
+
+``Prewarmer`` runs a background thread at the lowest CPU priority that
+regenerates the top topics only while no live jobs are running and the load
+average is low. Its inference runs on that thread rather than the shared
+batcher, and a topic is abandoned (``Preempted``) between batches as soon as
+a live job shows up. PyTorch's intra-op helper threads keep their normal
+priority, so that check is what bounds the overlap. Under ``serve.py`` only
+worker 0 warms.
+
+Results that completed without any fallback go into ``PrewarmStore``, a
+bounded SQLite table that ``generate_content`` in every worker checks
+before doing any work. The image and the PDF are produced along the way,
+so both are already on disk when a warmed result is served.
+
+Only summaries are pre-generated. Stories are sampled, and serving a stored
+one would hand every user the same story.
+"""
+import json
+import os
+import threading
+import time
+
+import metrics
+from source_cache import normalize_query
+from state_store import StateStore
+
+CONTENT_TYPES = ("summary",)
+# A topic needs about this many recent requests before it is worth warming
+MIN_SCORE = 2.0
+MAX_TOPICS = 10000
+
+
+class Preempted(Exception):
+    """Background generation stopped because live requests arrived."""
+
+
+class PrewarmStore:
+    """Pre-generated results in a SQLite file shared by every worker; they expire after ``ttl`` seconds.
+
+    Beyond ``max_items`` the least recently warmed results are dropped.
+    Hit and miss counts are per process.
+    """
+
+    def __init__(self, path, max_items=100, ttl=6 * 3600):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._state = StateStore(path, "prewarmed", ttl, max_entries=max_items)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content_type, prompt):
+        result = self._state.get(_key(content_type, prompt))
+        with self._lock:
+            if result is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.cache_event("prewarmed", result is not None)
+        return result
+
+    def fresh(self, content_type, prompt):
+        """Whether a result is stored and not expired, without counting a lookup."""
+        return self._state.updated(_key(content_type, prompt)) is not None
+
+    def put(self, content_type, prompt, result):
+        self._state.put(_key(content_type, prompt), result)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "size": self._state.count(),
+            "max_size": self.max_items,
+        }
+
+
+def _key(content_type, prompt):
+    return f"{content_type}:{normalize_query(prompt)}"
+
+
+class TopicTracker:
+    def __init__(self, half_life=3600):
+        self.half_life = half_life
+        self._topics = {}  # (content_type, normalized prompt) -> [score, last seen, prompt]
+        self._lock = threading.Lock()
+
+    def record(self, prompt, content_type, ts=None):
+        ts = time.time() if ts is None else ts
+        key = (content_type, normalize_query(prompt))
+        with self._lock:
+            entry = self._topics.get(key)
+            if entry is None:
+                self._topics[key] = [1.0, ts, prompt]
+            else:
+                entry[0] = self._decayed(entry, ts) + 1.0
+                entry[1] = max(entry[1], ts)
+                entry[2] = prompt
+            if len(self._topics) > MAX_TOPICS:
+                self._prune(ts)
+
+    def top(self, n, min_score=MIN_SCORE):
+        """The ``n`` highest scoring (content_type, prompt, score) entries."""
+        now = time.time()
+        with self._lock:
+            ranked = [
+                (content_type, entry[2], self._decayed(entry, now))
+                for (content_type, _), entry in self._topics.items()
+            ]
+        ranked = [item for item in ranked if item[2] >= min_score]
+        ranked.sort(key=lambda item: item[2], reverse=True)
+        return ranked[:n]
+
+    def load(self, records):
+        """Count logged {"ts", "prompt", "content_type"} records, oldest first."""
+        for record in records:
+            self.record(record["prompt"], record.get("content_type", "summary"), record.get("ts"))
+        return len(records)
+
+    def _decayed(self, entry, now):
+        return entry[0] * 0.5 ** (max(0.0, now - entry[1]) / self.half_life)
+
+    def _prune(self, now):
+        # Keep the better-scoring half once the table is full
+        ranked = sorted(self._topics, key=lambda key: self._decayed(self._topics[key], now))
+        for key in ranked[:len(ranked) // 2]:
+            del self._topics[key]
+
+
+class RequestLog:
+    """Append-only JSONL log of generation requests, rotated to ``<path>.1`` at ``max_bytes``.
+
+    Several processes may append to it; ``read_new`` tails it across rotations.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._tailing = False
+        self._inode = None  # file being tailed and how far it has been read
+        self._offset = 0
+
+    def read_new(self, max_records=100000):
+        """Records appended since the last call (the whole log on the first), oldest first."""
+        records = []
+        with self._lock:
+            current = _inode(self.path)
+            if not self._tailing:
+                self._tailing = True
+                records.extend(self._read_from(self.path + ".1", 0)[0])
+            elif self._inode != current:
+                # Rotated since the last read: finish the old file first
+                if self._inode is not None and _inode(self.path + ".1") == self._inode:
+                    records.extend(self._read_from(self.path + ".1", self._offset)[0])
+                self._offset = 0
+            self._inode = current
+            if current is not None:
+                new, self._offset = self._read_from(self.path, self._offset)
+                records.extend(new)
+        return records[-max_records:]
+
+    def _read_from(self, path, offset):
+        records = []
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # still being written; picked up next time
+                    offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and record.get("prompt"):
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+        return records, offset
+
+    def append(self, prompt, content_type):
+        line = json.dumps({"ts": round(time.time(), 3), "prompt": prompt, "content_type": content_type})
+        try:
+            with self._lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                    full = self.max_bytes and f.tell() >= self.max_bytes
+                if full:
+                    os.replace(self.path, self.path + ".1")
+        except OSError as e:
+            print(f"⚠️ Could not write request log {self.path}: {str(e)}")
+
+
+class Prewarmer:
+    def __init__(self, generator, tracker, log=None, is_busy=None, interval=30, top_n=20, max_load=0.5, nice=19):
+        self.generator = generator
+        self.tracker = tracker
+        self.log = log
+        self.is_busy = is_busy
+        self.interval = interval
+        self.top_n = top_n
+        self.max_load = max_load
+        self.nice = nice
+
+        self.warmed = 0
+        self.paused = 0
+        self.failed = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record_request(self, prompt, content_type):
+        # With a log the tracker reads it back, which also picks up other workers' requests
+        if self.log is not None:
+            self.log.append(prompt, content_type)
+        else:
+            self.tracker.record(prompt, content_type)
+
+    def start(self):
+        # Called from the app's startup hook after the fork; under serve.py only worker 0 calls it
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+                self._thread.start()
+
+    def stats(self):
+        self.read_log()
+        return {
+            "warmed": self.warmed,
+            "paused": self.paused,
+            "failed": self.failed,
+            "top": [
+                {"content_type": content_type, "prompt": prompt, "score": round(score, 2)}
+                for content_type, prompt, score in self.tracker.top(self.top_n)
+            ],
+            "store": self.generator.prewarmed.stats(),
+        }
+
+    def warm_once(self):
+        """Generate the top topics that have no fresh stored result; stops as soon as the server gets busy."""
+        store = self.generator.prewarmed
+        for content_type, prompt, _ in self.tracker.top(self.top_n):
+            if content_type not in CONTENT_TYPES or store.fresh(content_type, prompt):
+                continue
+            if self._busy():
+                self.paused += 1
+                return
+            try:
+                with metrics.span("prewarm"):
+                    result = self.generator.generate_content(
+                        prompt, content_type, use_prewarmed=False, yield_to=self._live_work
+                    )
+            except Preempted:
+                self.paused += 1
+                return
+            # Degraded output (no source, no image, fallback text) is not worth serving again
+            if "error" in result or result.get("degraded"):
+                self.failed += 1
+                continue
+            store.put(content_type, prompt, result)
+            self.warmed += 1
+
+    def read_log(self):
+        """Feed the ranking with requests logged by any worker since the last read."""
+        if self.log is None:
+            return 0
+        return self.tracker.load(self.log.read_new())
+
+    def _run(self):
+        _lower_priority(self.nice)
+        count = self.read_log()
+        if count:
+            print(f"✅ Seeded topic ranking from {count} logged requests")
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.read_log()
+                self.warm_once()
+            except Exception as e:
+                print(f"⚠️ Pre-generation failed: {str(e)}")
+
+    def _live_work(self):
+        # The load average is not checked here: warming itself raises it
+        return self.is_busy is not None and self.is_busy()
+
+    def _busy(self):
+        if self._live_work():
+            return True
+        try:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):
+            return False
+        return load > self.max_load
+
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _lower_priority(nice):
+    # On Linux setpriority on the native thread id renices only this thread
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+    except (AttributeError, OSError) as e:
+        print(f"⚠️ Could not lower pre-generation priority: {str(e)}")
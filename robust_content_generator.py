@@ -13,6 +13,8 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 
+from prefix_cache import PrefixCache
+
 warnings.filterwarnings('ignore')
 
 
@@ -21,6 +23,7 @@ class RobustContentGenerator:
         set_seed(datetime.now().microsecond)
         self.summarizer = self._safe_load_model("summarization", "facebook/bart-large-cnn")
         self.story_gen = self._safe_load_model("text-generation", "gpt2-medium")
+        self.prefix_cache = PrefixCache()
 
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -111,18 +114,21 @@ class RobustContentGenerator:
 
     def _generate_story_with_paragraphs(self, prompt, word_count):
         try:
-            # Create a more structured prompt for the model
-            structured_prompt = f"""Write a complete short story titled "{prompt}" with the following requirements:
+            # Create a more structured prompt for the model. The fixed requirements
+            # come before the title so their key/value states can be reused.
+            template = f"""Write a complete short story with the following requirements:
             - Word count: approximately {word_count} words
             - Include a clear beginning, middle, and end
             - Develop at least one main character
             - Have a central conflict or challenge
             - Provide a resolution
             
-            Story:\n"""
+            Title:"""
+            title = f""" "{prompt}"
             
-            story = self.story_gen(
-                structured_prompt,
+            Story:\n"""
+            structured_prompt = template + title
+            params = dict(
                 max_length=min(1024, word_count*2),
                 num_return_sequences=1,
                 temperature=0.9,  # Slightly higher temperature for creativity
@@ -131,7 +137,13 @@ class RobustContentGenerator:
                 repetition_penalty=1.2,  # Prevent repetition
                 do_sample=True,
                 truncation=True
-            )[0]['generated_text']
+            )
+
+            try:
+                story = self.prefix_cache.generate(self.story_gen, template, title, **params)
+            except Exception as e:
+                print(f"⚠️ Prefix cache unavailable, encoding the full prompt: {str(e)}")
+                story = self.story_gen(structured_prompt, **params)[0]['generated_text']
             
             # Clean up the output
             story = story.replace(structured_prompt, "").strip()
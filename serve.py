@@ -0,0 +1,134 @@
+"""Pre-fork server that shares one copy of the model weights across workers.
+
+Plain ``uvicorn --workers N`` imports the app in every process, so each one
+loads its own BART and GPT-2. Here the parent loads the preloaded models
+once, switches them to inference-only mode, freezes the heap and then forks
+the HTTP workers. The weights are never written after the fork, so the
+kernel keeps a single copy-on-write copy for every worker.
+
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+
+import config
+
+
+def freeze_models(pipelines):
+    """Make the loaded weights read-only so forked workers never copy them."""
+    if pipelines:
+        import torch
+
+        torch.set_grad_enabled(False)
+    for pipe in pipelines:
+        pipe.model.eval()
+        for param in pipe.model.parameters():
+            param.requires_grad_(False)
+
+    # Move every existing object to the permanent generation so the cyclic GC
+    # in the workers never writes to (and so never copies) their pages
+    gc.collect()
+    gc.freeze()
+
+
+def _run_worker(app, sock, threads):
+    import uvicorn
+
+    if threads:
+        from backends import set_num_threads
+
+        set_num_threads(threads)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from forked workers sharing one copy of the models")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS)
+    args = parser.parse_args()
+
+    # Rust tokenizers threads do not survive fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    import main as app_module
+
+    start = time.time()
+    # A thread alive at fork time could hold the manager's lock in the child; workers start their own
+    app_module.generator.models.defer_reaper = True
+    app_module.generator.warm_up(config.PRELOAD_MODELS)
+    torch_pipelines = [
+        pipe for pipe in app_module.generator.loaded_pipelines() if hasattr(pipe.model, "parameters")
+    ]
+    freeze_models(torch_pipelines)
+    # Evicting a shared model in a worker frees nothing and reloads it as a private copy
+    app_module.generator.models.pin_loaded()
+    print(f"✅ Models loaded in {round(time.time() - start, 1)}s: {app_module.generator.model_status()}")
+
+    # Split the cores between workers unless the thread count is pinned
+    threads = None
+    if torch_pipelines:
+        threads = config.INFERENCE_THREADS or max(1, (os.cpu_count() or 1) // args.workers)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            # Read by main.py so that only worker 0 pre-generates popular topics
+            os.environ["SERVE_WORKER_INDEX"] = str(index)
+            app_module.generator.models.defer_reaper = False
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                _run_worker(app_module.app, sock, threads)
+            finally:
+                os._exit(0)
+        workers[pid] = index
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for index in range(max(1, args.workers)):
+        spawn(index)
+    print(f"🚀 Serving on http://{args.host}:{args.port} with {len(workers)} workers")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = workers.pop(pid, None)
+        if not stopping and index is not None:
+            print(f"⚠️ Worker {pid} exited with status {status}, restarting")
+            time.sleep(1)
+            spawn(index)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Persistent cache for retrieved Wikipedia source text.
+
+Search results (normalized query -> page title) and extracted article text
+(page title -> paragraphs) are stored in separate tables of one SQLite file,
+so different phrasings of a topic share the downloaded article. Entries
+expire after ``ttl`` seconds, negative entries (no search result, no text)
+after the much shorter ``negative_ttl``, and each table is trimmed to ``max_entries``
+least-recently-used rows. SQLite's WAL mode lets several worker processes
+share the same file.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+TABLES = ("titles", "pages")
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+class SourceCache:
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=10000, negative_ttl=600):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def get_title(self, query):
+        return self._get("titles", normalize_query(query))
+
+    def put_title(self, query, title):
+        # An empty title records that the search had no results
+        self._put("titles", normalize_query(query), title or "")
+
+    def get_text(self, title):
+        return self._get("pages", title)
+
+    def put_text(self, title, text):
+        self._put("pages", title, text or "")
+
+    def _connect(self):
+        # sqlite connections must not cross threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for table in TABLES:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)")
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, table, key):
+        try:
+            conn = self._connect()
+            row = conn.execute(f"SELECT value, created FROM {table} WHERE key = ?", (key,)).fetchone()
+
+            now = time.time()
+            ttl = self.ttl if row is None or row[0] else self.negative_ttl
+            if row is not None and now - row[1] > ttl:
+                conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+                row = None
+
+            metrics.cache_event(f"source_{table}", row is not None)
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {table} SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+        except sqlite3.Error as e:
+            print(f"⚠️ Source cache read failed: {str(e)}")
+            return None
+
+    def _put(self, table, key, value):
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._evict(conn, table, now)
+        except sqlite3.Error as e:
+            print(f"⚠️ Source cache write failed: {str(e)}")
+
+    def _evict(self, conn, table, now):
+        conn.execute(f"DELETE FROM {table} WHERE created < ?", (now - self.ttl,))
+        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                f"DELETE FROM {table} WHERE key IN "
+                f"(SELECT key FROM {table} ORDER BY accessed ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
@@ -0,0 +1,108 @@
+"""State shared by every worker process.
+
+``serve.py`` forks several HTTP workers, and a client polling ``/jobs/{id}``
+or ``/batch/{id}`` may land on any of them. ``StateStore`` keeps one JSON
+document per id in a table of a SQLite file, written by the process that
+owns the job and readable from all of them. Documents expire ``ttl``
+seconds after their last update, and with ``max_entries`` the least
+recently written beyond that count are dropped. Like ``SourceCache`` it
+runs in WAL mode, so readers never block the writer.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PRUNE_INTERVAL = 60
+
+
+class StateStore:
+    def __init__(self, path, table, ttl=3600, max_entries=0):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._last_prune = 0.0
+
+    def put(self, key, value):
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, updated) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now)
+            )
+            if self.max_entries > 0:
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            if now - self._last_prune > PRUNE_INTERVAL:
+                self._last_prune = now
+                conn.execute(f"DELETE FROM {self.table} WHERE updated < ?", (now - self.ttl,))
+        except sqlite3.Error as e:
+            print(f"⚠️ State store write failed: {str(e)}")
+
+    def get(self, key):
+        try:
+            row = self._connect().execute(
+                f"SELECT value, updated FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ State store read failed: {str(e)}")
+            return None
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def updated(self, key):
+        """When ``key`` was last written, or None if it is missing or expired."""
+        try:
+            row = self._connect().execute(
+                f"SELECT updated FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ State store read failed: {str(e)}")
+            return None
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        return row[0]
+
+    def count(self):
+        try:
+            return self._connect().execute(
+                f"SELECT COUNT(*) FROM {self.table} WHERE updated >= ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"⚠️ State store read failed: {str(e)}")
+            return 0
+
+    def delete(self, key):
+        try:
+            self._connect().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"⚠️ State store write failed: {str(e)}")
+
+    def _connect(self):
+        # sqlite connections must not cross threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn